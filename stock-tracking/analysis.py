@@ -0,0 +1,286 @@
+"""Stock Price Tracking and Analysis Project: Comparative Analysis
+
+This module compares any number of stocks with each other. The stocks are first aligned on the
+trading days they have in common, then compared through:
+  - their performance rebased to 100 on the first common day, so that stocks on very different
+    price scales can be drawn on the same axes,
+  - the correlation matrix of their daily returns, over the whole time period or a rolling window,
+  - their beta against a benchmark stock.
+
+Each series is standardised once, so the correlation matrix needs one dot product per pair of
+stocks; with N stocks and T days that is N * (N + 1) / 2 dot products of length T, done in pure
+Python. Rolling correlations use prefix sums instead of recomputing each window, and the window
+sums of each series are shared by every pair it is part of.
+
+To plot the rebased performance of several stocks call plot_rebased(stock_names: list[str],
+time_period: str) in the Python Console, and to plot the heatmap of their correlations call
+plot_correlation_heatmap(stock_names: list[str], time_period: str).
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2022 Aryaman Sharma.
+"""
+import math
+import operator
+from array import array
+from itertools import accumulate, repeat
+from typing import Optional, Sequence
+
+import plotly.offline as pyo
+import plotly.graph_objs as go
+
+from stock_tracking import StockWindow, align_windows, day_to_date, load_stocks
+
+
+###################################################################################################
+# Aligning Stocks
+###################################################################################################
+
+def align_closes(windows: list[StockWindow]) -> tuple[array, list[array]]:
+    """Return the day numbers that every window in windows has in common, and the close prices of
+    each window on those days.
+    """
+    if not windows:
+        return (array('i'), [])
+    common = set(windows[0].days)
+    for window in windows[1:]:
+        common.intersection_update(window.days)
+
+    days = array('i', sorted(common))
+    closes = [array('d', (close for day, close in zip(window.days, window.close) if day in common))
+              for window in windows]
+    return (days, closes)
+
+
+def rebase(closes: Sequence[float], base: float = 100.0) -> array:
+    """Return closes scaled so that the first one is equal to base.
+
+    >>> rebase([2.0, 3.0, 1.0]).tolist()
+    [100.0, 150.0, 50.0]
+    """
+    if not closes:
+        return array('d')
+    return array('d', map(operator.mul, closes, repeat(base / closes[0])))
+
+
+def simple_returns(closes: Sequence[float]) -> array:
+    """Return the daily returns of closes, closes[i] / closes[i - 1] - 1, for i >= 1.
+
+    >>> simple_returns([2.0, 3.0, 1.5]).tolist()
+    [0.5, -0.5]
+    """
+    ratios = map(operator.truediv, closes[1:], closes[:-1])
+    return array('d', map(operator.sub, ratios, repeat(1.0)))
+
+
+###################################################################################################
+# Correlation and Beta
+###################################################################################################
+
+def _standardise(values: Sequence[float]) -> array:
+    """Return values minus their mean, divided by their population standard deviation (or all 0.0
+    if they are constant).
+    """
+    n = len(values)
+    mean = math.fsum(values) / n
+    centred = array('d', map(operator.sub, values, repeat(mean)))
+    deviation = math.sqrt(math.fsum(map(operator.mul, centred, centred)) / n)
+    if deviation == 0:
+        return array('d', repeat(0.0, n))
+    return array('d', map(operator.mul, centred, repeat(1 / deviation)))
+
+
+def correlation_matrix(series: list[Sequence[float]]) -> list[list[float]]:
+    """Return the matrix of Pearson correlations between every pair of series in series.
+
+    Preconditions:
+        - all(len(values) == len(series[0]) for values in series)
+        - len(series[0]) >= 2
+
+    >>> matrix = correlation_matrix([[1.0, 2.0, 3.0], [2.0, 4.0, 6.0], [3.0, 2.0, 1.0]])
+    >>> [[round(value, 9) for value in row] for row in matrix]
+    [[1.0, 1.0, -1.0], [1.0, 1.0, -1.0], [-1.0, -1.0, 1.0]]
+    """
+    standardised = [_standardise(values) for values in series]
+    n = len(series[0]) if series else 0
+    matrix = [[0.0] * len(series) for _ in series]
+    for i, row in enumerate(standardised):
+        for j in range(i, len(series)):
+            value = sum(map(operator.mul, row, standardised[j])) / n
+            matrix[i][j] = matrix[j][i] = value
+    return matrix
+
+
+def _window_sums(values: Sequence[float], window: int) -> list[float]:
+    """Return the sum of each window of window consecutive values, using prefix sums.
+
+    >>> _window_sums([1.0, 2.0, 3.0, 4.0], 3)
+    [6.0, 9.0]
+    """
+    prefix = list(accumulate(values, initial=0.0))
+    return list(map(operator.sub, prefix[window:], prefix[:-window]))
+
+
+def _rolling_from_sums(length: int, window: int, sums: tuple[list[float], list[float]],
+                       squares: tuple[list[float], list[float]], products: list[float]) -> array:
+    """Return the rolling correlation of two series of length rows over window rows, from the
+    window sums of the two series, of their squares and of their products.
+    """
+    result = array('d', repeat(math.nan, min(window - 1, length)))
+    for sx, sy, sxx, syy, sxy in zip(*sums, *squares, products):
+        covariance = window * sxy - sx * sy
+        variance = (window * sxx - sx * sx) * (window * syy - sy * sy)
+        result.append(covariance / math.sqrt(variance) if variance > 0 else math.nan)
+    return result
+
+
+def rolling_correlation(xs: Sequence[float], ys: Sequence[float], window: int) -> array:
+    """Return the Pearson correlation of xs and ys over each window of window rows, or nan for the
+    first window - 1 rows and for windows where either series is constant.
+
+    Preconditions:
+        - len(xs) == len(ys)
+        - window >= 2
+
+    >>> [round(value, 9) for value in rolling_correlation([1.0, 2.0, 3.0, 2.0],
+    ...                                                   [1.0, 2.0, 3.0, 4.0], 3)]
+    [nan, nan, 1.0, 0.0]
+    """
+    return _rolling_from_sums(len(xs), window, (_window_sums(xs, window), _window_sums(ys, window)),
+                              (_window_sums(list(map(operator.mul, xs, xs)), window),
+                               _window_sums(list(map(operator.mul, ys, ys)), window)),
+                              _window_sums(list(map(operator.mul, xs, ys)), window))
+
+
+def rolling_correlation_matrix(series: list[Sequence[float]], window: int) -> list[list[array]]:
+    """Return the matrix of the rolling correlations (see rolling_correlation) between every pair
+    of series in series over window rows.
+
+    The window sums of each series and of its squares are computed once and shared by every pair it
+    is part of, so each pair only adds the window sums of its products. matrix[i][j] and
+    matrix[j][i] are the same array.
+
+    Preconditions:
+        - all(len(values) == len(series[0]) for values in series)
+        - window >= 2
+
+    >>> matrix = rolling_correlation_matrix([[1.0, 2.0, 3.0, 2.0], [1.0, 2.0, 3.0, 4.0]], 3)
+    >>> [round(value, 9) for value in matrix[0][1]], matrix[1][0] is matrix[0][1]
+    ([nan, nan, 1.0, 0.0], True)
+    >>> [round(value, 9) for value in matrix[1][1]]
+    [nan, nan, 1.0, 1.0]
+    """
+    length = len(series[0]) if series else 0
+    sums = [_window_sums(values, window) for values in series]
+    squares = [_window_sums(list(map(operator.mul, values, values)), window) for values in series]
+    matrix = [[array('d')] * len(series) for _ in series]
+    for i, xs in enumerate(series):
+        for j in range(i, len(series)):
+            products = squares[i] if i == j else _window_sums(
+                list(map(operator.mul, xs, series[j])), window)
+            matrix[i][j] = matrix[j][i] = _rolling_from_sums(
+                length, window, (sums[i], sums[j]), (squares[i], squares[j]), products)
+    return matrix
+
+
+def beta(returns: Sequence[float], benchmark_returns: Sequence[float]) -> float:
+    """Return the beta of returns against benchmark_returns: their covariance divided by the
+    variance of benchmark_returns.
+
+    Preconditions:
+        - len(returns) == len(benchmark_returns) >= 2
+
+    >>> round(beta([0.02, -0.04, 0.06], [0.01, -0.02, 0.03]), 9)
+    2.0
+    """
+    n = len(returns)
+    mean = math.fsum(returns) / n
+    benchmark_mean = math.fsum(benchmark_returns) / n
+    centred_benchmark = list(map(operator.sub, benchmark_returns, repeat(benchmark_mean)))
+    covariance = math.fsum(map(operator.mul, map(operator.sub, returns, repeat(mean)),
+                               centred_benchmark))
+    variance = math.fsum(map(operator.mul, centred_benchmark, centred_benchmark))
+    return covariance / variance if variance > 0 else math.nan
+
+
+###################################################################################################
+# Comparing Stocks
+###################################################################################################
+
+def compare_stocks(stock_names: list[str], time_period: str, benchmark: Optional[str] = None,
+                   window: Optional[int] = None) -> dict:
+    """Return the comparison of the stocks in stock_names over time_period, as a dictionary with:
+      - 'dates': the trading days common to every stock, as datetime.date objects
+      - 'rebased': maps each stock to its close prices rebased to 100 on the first common day
+      - 'correlation': the correlation matrix of the daily returns, in the order of stock_names
+      - 'beta': maps each stock to its beta against benchmark, if benchmark is given
+      - 'rolling_correlation_matrix': the matrix of the rolling correlations of the daily returns
+        over window days (see rolling_correlation_matrix), in the order of stock_names, if window
+        is given
+      - 'rolling_correlation': maps each stock to the rolling correlation of its returns with the
+        returns of benchmark over window days, if both benchmark and window are given
+
+    The benchmark is loaded along with the other stocks if it is not one of them. A ValueError is
+    raised if the stocks have fewer than 2 trading days in common over time_period, since no
+    returns can be computed then.
+    """
+    names = list(dict.fromkeys(stock_names + ([benchmark] if benchmark else [])))
+    stocks = load_stocks(names)
+    days, closes = align_closes(align_windows([stocks[name] for name in names], time_period))
+    if len(days) < 2:
+        raise ValueError(f"{', '.join(names)} have {len(days)} trading days in common over "
+                         f"{time_period}, at least 2 are needed")
+    closes_by_name = dict(zip(names, closes))
+    returns = {name: simple_returns(closes_by_name[name]) for name in names}
+
+    comparison = {
+        'dates': [day_to_date(day) for day in days],
+        'rebased': {name: rebase(closes_by_name[name]) for name in stock_names},
+        'correlation': correlation_matrix([returns[name] for name in stock_names]),
+    }
+    if window:
+        comparison['rolling_correlation_matrix'] = rolling_correlation_matrix(
+            [returns[name] for name in stock_names], window)
+    if benchmark:
+        comparison['beta'] = {name: beta(returns[name], returns[benchmark])
+                              for name in stock_names}
+        if window:
+            comparison['rolling_correlation'] = {
+                name: rolling_correlation(returns[name], returns[benchmark], window)
+                for name in stock_names}
+    return comparison
+
+
+def plot_rebased(stock_names: list[str], time_period: str) -> None:
+    """Plot the close prices of the stocks in stock_names over time_period, rebased to 100 on the
+    first trading day they have in common, on the same set of axes.
+    """
+    comparison = compare_stocks(stock_names, time_period)
+    lines = [go.Scatter(x=comparison['dates'], y=comparison['rebased'][name].tolist(),
+                        mode='lines', name=name)
+             for name in stock_names]
+
+    layout_stocks = go.Layout(
+        title='Stock Performance (Rebased to 100) vs Time',
+        xaxis=dict(title='Time', autorange=True),
+        yaxis=dict(title='Performance', autorange=True)
+    )
+
+    pyo.plot(go.Figure(data=lines, layout=layout_stocks))
+
+
+def plot_correlation_heatmap(stock_names: list[str], time_period: str) -> None:
+    """Plot a heatmap of the correlations between the daily returns of the stocks in stock_names
+    over time_period.
+    """
+    comparison = compare_stocks(stock_names, time_period)
+    heatmap = go.Heatmap(z=comparison['correlation'], x=stock_names, y=stock_names,
+                         zmin=-1, zmax=1, colorscale='RdBu')
+
+    layout_stocks = go.Layout(
+        title='Correlation of Daily Returns',
+        yaxis=dict(autorange='reversed')
+    )
+
+    pyo.plot(go.Figure(data=[heatmap], layout=layout_stocks))
@@ -0,0 +1,187 @@
+"""Stock Price Tracking and Analysis Project: Batch Reports
+
+This module writes the charts of many groups of stocks to files without opening a browser, e.g. for
+a nightly job. The charts of the groups are built in parallel in a pool of processes, and every
+chart is written to its own html (and/or JSON) file in the output folder. The html files all load
+the same copy of plotly.js, written once to the output folder, instead of embedding it.
+
+Run it from the command line, for example:
+
+    python batch_report.py --groups AAPL,AMZN TSLA --periods max 1_year --output reports
+
+which writes reports/AAPL-AMZN_max.html, reports/AAPL-AMZN_1_year.html, reports/TSLA_max.html and
+reports/TSLA_1_year.html, along with reports/plotly.min.js and the timings of every chart in
+reports/timings.json.
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2022 Aryaman Sharma.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+
+import plotly.offline as pyo
+
+import stock_tracking
+
+
+###################################################################################################
+# Rendering Charts
+###################################################################################################
+
+def chart_filename(group: list[str], time_period: str) -> str:
+    """Return the name, without extension, of the file of the chart of group over time_period.
+
+    >>> chart_filename(['AAPL', 'TSLA'], '2020-01-01:2020-12-31')
+    'AAPL-TSLA_2020-01-01_to_2020-12-31'
+    """
+    return '-'.join(group) + '_' + time_period.replace(':', '_to_')
+
+
+def render_group(group: list[str], periods: list[str], output: str, formats: list[str],
+                 options: dict) -> list[dict]:
+    """Write the chart of the stocks in group over each time period in periods to output, in each
+    of formats ('html' or 'json'), and return the timings of each chart.
+
+    options are passed on to stock_tracking.build_figure. This runs in a worker process of
+    render_reports. A chart that cannot be written is recorded with its error instead of its
+    timings, and the other charts are still written.
+    """
+    timings = []
+    for time_period in periods:
+        start = time.perf_counter()
+        path = os.path.join(output, chart_filename(group, time_period))
+        files = []
+        try:
+            figure = stock_tracking.build_figure(group, time_period, **options)
+            built = time.perf_counter()
+            if 'html' in formats:
+                figure.write_html(path + '.html', include_plotlyjs='directory', auto_open=False)
+                files.append(path + '.html')
+            if 'json' in formats:
+                with open(path + '.json', 'w', encoding='utf-8') as file:
+                    file.write(figure.to_json())
+                files.append(path + '.json')
+        except Exception as error:
+            timings.append(_failed_chart(group, time_period, error))
+            continue
+        written = time.perf_counter()
+
+        timings.append({'group': group, 'period': time_period, 'files': files,
+                        'build_s': built - start, 'write_s': written - built,
+                        'total_s': written - start})
+    return timings
+
+
+def _failed_chart(group: list[str], time_period: str, error: BaseException) -> dict:
+    """Return the entry recorded in the timings for the chart of group over time_period that
+    failed with error.
+    """
+    return {'group': group, 'period': time_period, 'files': [],
+            'error': f'{type(error).__name__}: {error}'}
+
+
+def render_reports(groups: list[list[str]], periods: list[str], output: str,
+                   formats: tuple[str, ...] = ('html',), max_workers: Optional[int] = None,
+                   options: Optional[dict] = None) -> list[dict]:
+    """Write the chart of every group of stocks in groups over every time period in periods to the
+    folder output, using a pool of max_workers processes, and return the timings of every chart.
+
+    The charts that could not be written, including every chart of a group whose worker failed,
+    have an 'error' entry instead of timings.
+    """
+    os.makedirs(output, exist_ok=True)
+    if 'html' in formats:
+        # Written once here, so that the workers never write it at the same time.
+        with open(os.path.join(output, 'plotly.min.js'), 'w', encoding='utf-8') as file:
+            file.write(pyo.get_plotlyjs())
+
+    # The groups are already spread over processes, so each one loads its stocks in threads.
+    options = {'use_processes': False, **(options or {})}
+    timings = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(render_group, group, periods, output, list(formats), options):
+                   group for group in groups}
+        for future in as_completed(futures):
+            try:
+                timings.extend(future.result())
+            except Exception as error:
+                timings.extend(_failed_chart(futures[future], time_period, error)
+                               for time_period in periods)
+    return timings
+
+
+###################################################################################################
+# Command Line
+###################################################################################################
+
+def _parse_arguments(argv: Optional[list[str]]) -> argparse.Namespace:
+    """Return the parsed command line arguments argv."""
+    parser = argparse.ArgumentParser(description='Write the charts of groups of stocks to files.')
+    parser.add_argument('--groups', nargs='*', default=[],
+                        help='groups of stocks, each a comma-separated list such as AAPL,TSLA')
+    parser.add_argument('--groups-file',
+                        help='a file with one comma-separated group of stocks per line')
+    parser.add_argument('--periods', nargs='+', default=['max'],
+                        help="time periods such as max, 1_year or 2020-01-01:2020-12-31")
+    parser.add_argument('--output', default='reports', help='the folder to write the charts to')
+    parser.add_argument('--format', nargs='+', choices=('html', 'json'), default=['html'],
+                        dest='formats', help='the file formats to write')
+    parser.add_argument('--data-dir', default='.', help='the folder containing the csv files')
+    parser.add_argument('--workers', type=int, default=None, help='the number of processes')
+    parser.add_argument('--max-points', type=int, default=None,
+                        help='decimate each line to about this many points')
+    parser.add_argument('--chart', choices=('line', 'candlestick'), default='line')
+    parser.add_argument('--frequency', choices=('auto',) + stock_tracking.FREQUENCIES,
+                        default=None, help='plot bars of this frequency instead of daily rows')
+    parser.add_argument('--indicators', nargs='*', default=[],
+                        help='indicators to draw, such as sma:200 or rsi:14')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Write the charts described by the command line arguments argv, print their timings, and
+    return 1 if any chart could not be written or 0 otherwise.
+    """
+    arguments = _parse_arguments(argv)
+    groups = [group.split(',') for group in arguments.groups]
+    if arguments.groups_file:
+        with open(arguments.groups_file, 'r', encoding='utf-8') as file:
+            groups.extend(line.strip().split(',') for line in file if line.strip())
+    if not groups:
+        print('no groups of stocks given', file=sys.stderr)
+        return 2
+
+    output = os.path.abspath(arguments.output)
+    os.chdir(arguments.data_dir)
+    options = {'max_points': arguments.max_points, 'chart': arguments.chart,
+               'frequency': arguments.frequency, 'indicators': arguments.indicators}
+
+    start = time.perf_counter()
+    timings = render_reports(groups, arguments.periods, output, tuple(arguments.formats),
+                             arguments.workers, options)
+    elapsed = time.perf_counter() - start
+
+    timings.sort(key=lambda timing: (timing['group'], timing['period']))
+    failed = [timing for timing in timings if 'error' in timing]
+    for timing in timings:
+        name = chart_filename(timing['group'], timing['period'])
+        if 'error' in timing:
+            print(f"{name}: failed, {timing['error']}", file=sys.stderr)
+        else:
+            print(f"{name}: build {timing['build_s'] * 1000:.0f} ms, "
+                  f"write {timing['write_s'] * 1000:.0f} ms")
+    print(f'{len(timings) - len(failed)} charts in {elapsed:.1f} s, {len(failed)} failed')
+    with open(os.path.join(output, 'timings.json'), 'w', encoding='utf-8') as file:
+        json.dump({'elapsed_s': elapsed, 'charts': timings}, file, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,477 @@
+"""Stock Price Tracking and Analysis Project: Benchmarks
+
+This module measures the speed of the different parts of the project on the bundled stock csv
+files. To run every benchmark call run_benchmarks() in the Python Console, or run this file as a
+script from the folder containing the csv files.
+
+The suite of benchmarks run by run_suite works on a synthetic universe of stocks instead, written
+by write_synthetic_universe with a configurable number of tickers, length of history, and rate of
+missing days and 'null' rows, so that its results can be reproduced on any machine. Its results
+can be saved as a JSON baseline, and later runs compared against it to flag regressions:
+
+    python benchmarks.py --suite --save-baseline baseline.json
+    python benchmarks.py --suite --baseline baseline.json
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2022 Aryaman Sharma.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Callable, Iterator, Optional
+
+import indicators
+import stock_tracking
+from stock_tracking import StockTracking
+
+BUNDLED_STOCKS = ('AAPL', 'AMZN', 'TSLA')
+
+
+###################################################################################################
+# Helpers
+###################################################################################################
+
+def time_call(function: Callable, *args, repeat: int = 5) -> float:
+    """Return the best wall-clock time in seconds of repeat calls of function(*args)."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+###################################################################################################
+# Parsing
+###################################################################################################
+# The csv files used to be parsed by reading every line with readlines() and splitting each line
+# twice, once for extract_date and once for extract_stock_close_price. _legacy_read_data keeps that
+# path around so that the bulk parser in read_data can be compared against it. Note that the legacy
+# path only converts the Close column while read_data converts all six price columns.
+
+def _legacy_read_data(stock_name: str, filename: str) -> dict[str, StockTracking]:
+    """Return the same data as stock_tracking.read_data, parsed one line at a time."""
+    with open(filename, 'r', encoding='utf-8') as file:
+        stock_data = file.readlines()
+
+    stock = StockTracking(stock_name)
+    for line in stock_data[1:]:
+        day = stock_tracking.extract_date(line.split(',')[0])
+        stock_close_price = stock_tracking.extract_stock_close_price(line)
+        stock.add_stock_price_info((day, stock_close_price))
+    return {stock_name: stock}
+
+
+def bench_parsers(stock_names: tuple[str, ...] = BUNDLED_STOCKS) -> dict[str, dict[str, float]]:
+    """Return the time taken by the legacy per-line parser and by read_data for each stock in
+    stock_names, together with the number of rows and the speedup.
+    """
+    results = {}
+    for stock_name in stock_names:
+        filename = stock_name + '.csv'
+        rows = len(stock_tracking.read_data(stock_name, filename, use_cache=False)[stock_name])
+        legacy = time_call(_legacy_read_data, stock_name, filename)
+        # Without the cache, so that the bulk parser is timed rather than a read of the cache file.
+        bulk = time_call(stock_tracking.read_data, stock_name, filename, False)
+        results[stock_name] = {'rows': rows, 'legacy_s': legacy, 'bulk_s': bulk,
+                               'speedup': legacy / bulk}
+    return results
+
+
+###################################################################################################
+# Synthetic Data
+###################################################################################################
+
+def write_synthetic_csv(filename: str, rows: int, rows_per_day: int = 1, seed: int = 0,
+                        gap_rate: float = 0.0, null_rate: float = 0.0,
+                        start: date = date(2000, 1, 3)) -> None:
+    """Write a csv file in the format of "https://finance.yahoo.com/" with rows rows of a random
+    walk, starting on start. If rows_per_day is more than 1, the file holds minute bars, with
+    rows_per_day rows per trading day.
+
+    Besides weekends, each trading day is skipped with probability gap_rate, like a holiday, and
+    each row is written as a 'null' row, like the missing rows of Yahoo, with probability null_rate.
+    """
+    generator = random.Random(seed)
+    price = 100.0
+    day = start
+    with open(filename, 'w', encoding='utf-8') as file:
+        file.write(('Datetime' if rows_per_day > 1 else 'Date') +
+                   ',Open,High,Low,Close,Adj Close,Volume\n')
+        written = 0
+        while written < rows:
+            while gap_rate and generator.random() < gap_rate:
+                day += timedelta(days=3 if day.weekday() == 4 else 1)
+            for minute in range(min(rows_per_day, rows - written)):
+                timestamp = day.isoformat()
+                if rows_per_day > 1:
+                    timestamp += f' {9 + (30 + minute) // 60:02d}:{(30 + minute) % 60:02d}:00'
+                if null_rate and generator.random() < null_rate:
+                    file.write(timestamp + ',null' * 6 + '\n')
+                    continue
+                open_price = price
+                price = max(0.01, price * (1 + generator.gauss(0, 0.01)))
+                high = max(open_price, price) * (1 + generator.random() * 0.005)
+                low = min(open_price, price) * (1 - generator.random() * 0.005)
+                file.write(f'{timestamp},{open_price:.6f},{high:.6f},{low:.6f},{price:.6f},'
+                           f'{price:.6f},{generator.randrange(1000, 1000000)}\n')
+            written += rows_per_day
+            day += timedelta(days=3 if day.weekday() == 4 else 1)
+
+
+def write_synthetic_universe(folder: str, tickers: int, rows: int, seed: int = 0,
+                             gap_rate: float = 0.0, null_rate: float = 0.0) -> list[str]:
+    """Write tickers synthetic csv files of rows daily rows each to folder (see
+    write_synthetic_csv), named SYN0000.csv, SYN0001.csv, ..., and return the names of the stocks.
+    """
+    os.makedirs(folder, exist_ok=True)
+    stock_names = [f'SYN{i:04d}' for i in range(tickers)]
+    for i, stock_name in enumerate(stock_names):
+        write_synthetic_csv(os.path.join(folder, stock_name + '.csv'), rows, seed=seed + i,
+                            gap_rate=gap_rate, null_rate=null_rate)
+    return stock_names
+
+
+###################################################################################################
+# Streaming
+###################################################################################################
+
+def bench_streaming(rows: int = 2_000_000, rows_per_day: int = 390,
+                    max_memory: int = 32 * 1024 * 1024) -> dict[str, float]:
+    """Write a synthetic file of rows minute bars, read it with stream_read_data reducing it to
+    daily bars, and return the time taken, the peak memory traced and the rows per second.
+
+    The file is read twice: once untraced for the time, since tracemalloc slows it down about ten
+    times, and once under tracemalloc for the peak memory. An AssertionError is raised if the peak
+    memory goes over max_memory or the number of daily rows is wrong, even when Python runs with
+    -O, so that --streaming can be used as a check.
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, 'SYNTH.csv')
+        write_synthetic_csv(filename, rows, rows_per_day)
+        size = os.path.getsize(filename)
+
+        start = time.perf_counter()
+        stock = stock_tracking.stream_read_data('SYNTH', filename, intraday=True,
+                                                max_memory=max_memory)
+        seconds = time.perf_counter() - start
+
+        tracemalloc.start()
+        stock_tracking.stream_read_data('SYNTH', filename, intraday=True, max_memory=max_memory)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    if len(stock) != -(-rows // rows_per_day):
+        raise AssertionError(f'{len(stock)} daily rows instead of {-(-rows // rows_per_day)}')
+    if peak > max_memory:
+        raise AssertionError(f'peak memory {peak} is over {max_memory}')
+    return {'rows': rows, 'file_bytes': size, 'seconds': seconds, 'peak_bytes': peak,
+            'rows_per_s': rows / seconds}
+
+
+###################################################################################################
+# Indicators
+###################################################################################################
+
+def bench_indicators(stock_names: tuple[str, ...] = BUNDLED_STOCKS,
+                     specs: tuple[str, ...] = ('sma:200', 'ema:50', 'bollinger:20:2', 'rsi:14',
+                                               'macd:12:26:9', 'drawdown:252', 'log_returns')
+                     ) -> dict[str, float]:
+    """Return the number of rows per second each indicator in specs is computed at, uncached, over
+    the close prices of stock_names.
+    """
+    stocks = stock_tracking.load_stocks(list(stock_names))
+    rows = sum(len(stock) for stock in stocks.values())
+    results = {}
+    for spec in specs:
+        name, parameters = indicators.parse_indicator(spec)
+        function = indicators.INDICATORS[name][0]
+        seconds = sum(time_call(function, stock.close, *parameters) for stock in stocks.values())
+        results[spec] = rows / seconds
+    return results
+
+
+###################################################################################################
+# Plotting
+###################################################################################################
+# The size of the html written for a figure grows with the number of points plotted, so figures
+# are built for every time period with and without decimation and serialised to html. plotly.js is
+# left out of the html, since it is the same for every figure.
+
+BENCH_PERIODS = ('max', '10_years', '5_years', '1_year', '1_month')
+
+
+def bench_html_output(stock_names: tuple[str, ...] = BUNDLED_STOCKS,
+                      periods: tuple[str, ...] = BENCH_PERIODS,
+                      max_points: int = 2000) -> dict[str, dict[str, float]]:
+    """Return the size in bytes of the html of the figure of stock_names and the time in seconds
+    taken to build and serialise it, for each period in periods, without and with decimation to
+    max_points points per line.
+    """
+    stock_tracking.load_stocks(list(stock_names))
+    results = {}
+    for period in periods:
+        result = {}
+        for label, points in (('full', None), ('decimated', max_points)):
+            start = time.perf_counter()
+            figure = stock_tracking.build_figure(list(stock_names), period, max_points=points)
+            html = figure.to_html(include_plotlyjs=False, full_html=False)
+            result[f'{label}_s'] = time.perf_counter() - start
+            result[f'{label}_bytes'] = len(html.encode('utf-8'))
+        results[period] = result
+    return results
+
+
+def _print_streaming(result: dict[str, float]) -> None:
+    """Print the result of bench_streaming."""
+    print(f"Streaming {result['rows']} minute bars ({result['file_bytes'] / 2 ** 20:.0f} MiB): "
+          f"{result['seconds']:.1f} s, {result['rows_per_s'] / 1e6:.2f} M rows/s, "
+          f"peak {result['peak_bytes'] / 2 ** 20:.1f} MiB")
+
+
+def run_benchmarks() -> None:
+    """Run every benchmark and print the results."""
+    print('Parsing (best of 5)')
+    for stock_name, result in bench_parsers().items():
+        print(f"  {stock_name}: {result['rows']} rows, legacy {result['legacy_s'] * 1000:.1f} ms, "
+              f"bulk {result['bulk_s'] * 1000:.1f} ms, {result['speedup']:.1f}x")
+
+    _print_streaming(bench_streaming())
+
+    print('Indicators')
+    for spec, rows_per_second in bench_indicators().items():
+        print(f'  {spec}: {rows_per_second / 1e6:.2f} M rows/s')
+
+    print('Html output of ' + ', '.join(BUNDLED_STOCKS))
+    for period, result in bench_html_output().items():
+        print(f"  {period}: full {result['full_bytes'] / 1024:.0f} KiB in "
+              f"{result['full_s'] * 1000:.0f} ms, decimated {result['decimated_bytes'] / 1024:.0f} "
+              f"KiB in {result['decimated_s'] * 1000:.0f} ms")
+
+
+###################################################################################################
+# Benchmark Suite
+###################################################################################################
+# run_suite measures the whole pipeline on a synthetic universe written to a temporary folder, and
+# returns a flat dictionary of metrics. The name of each metric tells which way is better: metrics
+# ending in '_per_s' are throughputs, and every other metric (seconds, microseconds, bytes) is a
+# cost, so compare_to_baseline knows whether a change is a regression without more configuration.
+
+SUITE_PERIODS = ('1_month', '1_year', '5_years', 'max')
+
+
+@contextmanager
+def _working_directory(folder: str) -> Iterator[None]:
+    """Run the body of the with statement in folder, since stocks are loaded from the current
+    folder.
+    """
+    previous = os.getcwd()
+    os.chdir(folder)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def _reset_caches(folder: str) -> None:
+    """Forget every loaded stock and delete the cache files of the csv files in folder."""
+    stock_tracking.clear_cache(folder)
+    stock_tracking.clear_ticker_cache()
+
+
+def _environment() -> dict[str, str]:
+    """Return a description of the machine and Python version the benchmarks are run on."""
+    return {'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(), 'system': platform.system(),
+            'cpus': str(os.cpu_count())}
+
+
+def bench_suite_parsing(stock_names: list[str]) -> dict[str, float]:
+    """Return the parse throughput of the csv files of stock_names in the current folder, the
+    throughput of reading them back from their cache files, and the peak memory of parsing the
+    first one.
+    """
+    filenames = [stock_name + '.csv' for stock_name in stock_names]
+    size = sum(os.path.getsize(filename) for filename in filenames)
+    start = time.perf_counter()
+    rows = sum(len(stock_tracking.read_data(stock_name, filename, use_cache=False)[stock_name])
+               for stock_name, filename in zip(stock_names, filenames))
+    parse_seconds = time.perf_counter() - start
+
+    for stock_name, filename in zip(stock_names, filenames):
+        stock = stock_tracking.read_data(stock_name, filename, use_cache=False)[stock_name]
+        stock_tracking.write_cache(stock, filename)
+    start = time.perf_counter()
+    for stock_name, filename in zip(stock_names, filenames):
+        stock_tracking.read_cache(stock_name, filename)
+    cache_seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    first = stock_tracking.read_data(stock_names[0], filenames[0], use_cache=False)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'parse.rows_per_s': rows / parse_seconds,
+            'parse.mib_per_s': size / 2 ** 20 / parse_seconds,
+            'cache_read.rows_per_s': rows / cache_seconds,
+            'parse.peak_bytes': peak,
+            'parse.peak_bytes_per_row': peak / max(len(first[stock_names[0]]), 1)}
+
+
+def bench_window_slicing(stock: StockTracking, periods: tuple[str, ...] = SUITE_PERIODS,
+                         repeat: int = 1000) -> dict[str, float]:
+    """Return the average time in microseconds taken by stock.last for each period in periods, over
+    the fastest of 5 rounds of repeat calls.
+    """
+    def slice_repeatedly(period: str) -> None:
+        for _ in range(repeat):
+            stock.last(period)
+
+    return {f'window.{period}_us': time_call(slice_repeatedly, period) / repeat * 1e6
+            for period in periods}
+
+
+def bench_multi_ticker_load(stock_names: list[str]) -> dict[str, float]:
+    """Return the time taken by load_stocks to load every stock in stock_names from the current
+    folder: from the csv files, from the cache files, and from the cache of loaded stocks.
+    """
+    _reset_caches('.')
+    results = {}
+    for label in ('cold_csv', 'cold_cache', 'warm'):
+        if label == 'cold_cache':
+            stock_tracking.clear_ticker_cache()
+        start = time.perf_counter()
+        stock_tracking.load_stocks(stock_names)
+        results[f'load.{label}_s'] = time.perf_counter() - start
+    return results
+
+
+def run_suite(tickers: int = 20, rows: int = 5000, gap_rate: float = 0.01,
+              null_rate: float = 0.001, seed: int = 0) -> dict:
+    """Write a synthetic universe of tickers stocks with rows rows each to a temporary folder, run
+    every benchmark of the suite on it and return the parameters, the environment and the metrics.
+    """
+    parameters = {'tickers': tickers, 'rows': rows, 'gap_rate': gap_rate,
+                  'null_rate': null_rate, 'seed': seed}
+    metrics = {}
+    with tempfile.TemporaryDirectory() as folder, _working_directory(folder):
+        stock_names = write_synthetic_universe(folder, tickers, rows, seed, gap_rate, null_rate)
+        try:
+            metrics.update(bench_suite_parsing(stock_names))
+            metrics.update(bench_multi_ticker_load(stock_names))
+            metrics.update(bench_window_slicing(stock_tracking.load_stock(stock_names[0])))
+            html = bench_html_output(tuple(stock_names[:3]), ('max',))['max']
+            metrics.update({f'html.{name}': value for name, value in html.items()})
+        finally:
+            _reset_caches(folder)
+    return {'parameters': parameters, 'environment': _environment(), 'metrics': metrics}
+
+
+def save_baseline(results: dict, filename: str) -> None:
+    """Save the results of run_suite to the JSON file filename."""
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+
+
+def load_baseline(filename: str) -> dict:
+    """Return the results of run_suite saved in the JSON file filename."""
+    with open(filename, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def compare_to_baseline(metrics: dict[str, float], baseline: dict[str, float],
+                        tolerance: float = 0.25) -> list[str]:
+    """Return a description of every metric in metrics that is worse than in baseline by more than
+    the fraction tolerance. Metrics ending in '_per_s' are better when higher, and every other
+    metric is better when lower.
+
+    >>> compare_to_baseline({'parse.rows_per_s': 50.0, 'load.warm_s': 1.1},
+    ...                     {'parse.rows_per_s': 100.0, 'load.warm_s': 1.0})
+    ['parse.rows_per_s: 100 -> 50 (-50%)']
+    """
+    regressions = []
+    for name in sorted(metrics.keys() & baseline.keys()):
+        old, new = baseline[name], metrics[name]
+        if old == 0:
+            continue
+        change = (new - old) / old
+        worse = -change if name.endswith('_per_s') else change
+        if worse > tolerance:
+            regressions.append(f'{name}: {old:.4g} -> {new:.4g} ({change:+.0%})')
+    return regressions
+
+
+def _parse_arguments(argv: Optional[list[str]]) -> argparse.Namespace:
+    """Return the parsed command line arguments argv."""
+    parser = argparse.ArgumentParser(description='Measure the speed of the project.')
+    parser.add_argument('--suite', action='store_true',
+                        help='run the suite on a synthetic universe instead of the bundled stocks')
+    parser.add_argument('--streaming', action='store_true',
+                        help='only check that streaming a large file stays within --max-memory')
+    parser.add_argument('--max-memory', type=int, default=32,
+                        help='the memory in MiB that --streaming may use')
+    parser.add_argument('--tickers', type=int, default=20, help='the number of synthetic stocks')
+    parser.add_argument('--rows', type=int, default=5000, help='the number of rows per stock')
+    parser.add_argument('--gap-rate', type=float, default=0.01,
+                        help='the probability of skipping a trading day')
+    parser.add_argument('--null-rate', type=float, default=0.001,
+                        help="the probability of writing a 'null' row")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save-baseline', help='save the results to this JSON file')
+    parser.add_argument('--baseline', help='compare the results with this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='the fraction by which a metric may get worse before it is flagged')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Run the benchmarks described by the command line arguments argv, and return 1 if any metric
+    regressed against the baseline or the streaming check failed, or 0 otherwise.
+    """
+    arguments = _parse_arguments(argv)
+    if arguments.streaming:
+        try:
+            _print_streaming(bench_streaming(max_memory=arguments.max_memory * 1024 * 1024))
+        except (AssertionError, MemoryError) as error:
+            print('streaming check failed: ' + str(error), file=sys.stderr)
+            return 1
+        return 0
+    if not arguments.suite:
+        run_benchmarks()
+        return 0
+
+    results = run_suite(arguments.tickers, arguments.rows, arguments.gap_rate,
+                        arguments.null_rate, arguments.seed)
+    for name, value in sorted(results['metrics'].items()):
+        print(f'{name}: {value:.4g}')
+    if arguments.save_baseline:
+        save_baseline(results, arguments.save_baseline)
+    if not arguments.baseline:
+        return 0
+
+    baseline = load_baseline(arguments.baseline)
+    if baseline['parameters'] != results['parameters']:
+        print('warning: the baseline was run with different parameters', file=sys.stderr)
+    if baseline['environment'] != results['environment']:
+        print('warning: the baseline was run on a different machine or Python', file=sys.stderr)
+    regressions = compare_to_baseline(results['metrics'], baseline['metrics'],
+                                      arguments.tolerance)
+    for regression in regressions:
+        print('regression: ' + regression)
+    if not regressions:
+        print('no regressions against ' + arguments.baseline)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Stock Price Tracking and Analysis Project: Decimation
+
+This module picks a few representative points out of a long series before it is plotted, so that a
+figure of tens of thousands of rows can be drawn with a few thousand points without changing how it
+looks. Every function returns the sorted positions of the points to keep, so the same positions can
+be used to pick the matching dates and prices.
+
+Two methods are provided:
+  - 'lttb' (Largest-Triangle-Three-Buckets) keeps, in every bucket of consecutive points, the point
+    forming the largest triangle with its neighbours, which preserves the visual shape of a line.
+  - 'minmax' keeps the lowest and highest point of every bucket, which preserves every extreme.
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2022 Aryaman Sharma.
+"""
+from typing import Sequence
+
+DECIMATION_METHODS = ('lttb', 'minmax')
+
+
+def decimate(xs: Sequence[float], ys: Sequence[float], max_points: int,
+             method: str = 'lttb') -> list[int]:
+    """Return the sorted positions of about max_points points of the line through xs and ys,
+    chosen with the given method (see lttb_indices and min_max_indices). If the line is already
+    short enough, every position is returned.
+
+    Preconditions:
+        - len(xs) == len(ys)
+        - max_points >= 4
+        - method in DECIMATION_METHODS
+
+    >>> decimate([0, 1, 2], [5.0, 6.0, 7.0], 10)
+    [0, 1, 2]
+    """
+    if len(ys) <= max_points:
+        return list(range(len(ys)))
+    if method == 'lttb':
+        return lttb_indices(xs, ys, max_points)
+    elif method == 'minmax':
+        return min_max_indices(ys, max_points)
+    raise ValueError(f'unknown decimation method {method!r}')
+
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], max_points: int) -> list[int]:
+    """Return the sorted positions of about max_points points of the line through xs and ys,
+    chosen with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept, and so are the lowest and highest points of the whole
+    line, so at most max_points + 2 positions are returned.
+
+    Preconditions:
+        - len(xs) == len(ys) > max_points >= 3
+
+    >>> ys = [0.0, 1.0, 0.0, 5.0, 0.0, 1.0, 0.0, 1.0, 0.0, -3.0, 0.0]
+    >>> lttb_indices(list(range(len(ys))), ys, 5)
+    [0, 3, 4, 9, 10]
+    """
+    n = len(ys)
+    bucket_size = (n - 2) / (max_points - 2)
+    selected = [0]
+    previous = 0
+
+    for bucket in range(max_points - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        # The third corner of the triangles is the average point of the next bucket.
+        next_start = end
+        next_end = min(int((bucket + 2) * bucket_size) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        count = next_end - next_start
+        average_x = sum(xs[next_start:next_end]) / count
+        average_y = sum(ys[next_start:next_end]) / count
+
+        previous_x, previous_y = xs[previous], ys[previous]
+        dx = previous_x - average_x
+        dy = average_y - previous_y
+        best_area = -1.0
+        best = start
+        for i in range(start, end):
+            # Twice the area of the triangle (previous, i, average), which has the same maximum.
+            area = abs(dx * (ys[i] - previous_y) + dy * (xs[i] - previous_x))
+            if area > best_area:
+                best_area = area
+                best = i
+        selected.append(best)
+        previous = best
+
+    selected.append(n - 1)
+    extremes = {min(range(n), key=ys.__getitem__), max(range(n), key=ys.__getitem__)}
+    return sorted(extremes.union(selected))
+
+
+def min_max_indices(ys: Sequence[float], max_points: int) -> list[int]:
+    """Return the sorted positions of at most max_points points of ys, keeping the lowest and the
+    highest point of every bucket of consecutive points, as well as the first and the last point.
+
+    Preconditions:
+        - len(ys) > max_points >= 4
+
+    >>> min_max_indices([3.0, 1.0, 2.0, 9.0, 4.0, 5.0, 0.0, 6.0, 7.0, 8.0], 6)
+    [0, 1, 3, 6, 8, 9]
+    """
+    n = len(ys)
+    buckets = (max_points - 2) // 2
+    bucket_size = (n - 2) / buckets
+    selected = {0, n - 1}
+    for bucket in range(buckets):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        positions = range(start, end)
+        selected.add(min(positions, key=ys.__getitem__))
+        selected.add(max(positions, key=ys.__getitem__))
+    return sorted(selected)
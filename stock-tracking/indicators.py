@@ -0,0 +1,385 @@
+"""Stock Price Tracking and Analysis Project: Technical Indicators
+
+This module computes technical indicators over the close prices of a stock, so that trends can be
+compared without exporting the data. Every indicator runs in O(n) time over the whole series, using
+prefix sums or a single running pass instead of recomputing each window, and returns array('d')
+columns parallel to the input. Positions where an indicator is not defined yet (the first
+window - 1 rows of a moving average, for example) are nan.
+
+An indicator is named by a spec string made of its name and parameters separated by colons, e.g.
+'sma:200', 'bollinger:20:2' or 'macd:12:26:9'. compute_indicator computes an indicator for a
+StockTracking object from its spec and caches the result per (stock, indicator, parameters).
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2022 Aryaman Sharma.
+"""
+import math
+import operator
+import threading
+import weakref
+from array import array
+from collections import OrderedDict, deque
+from itertools import accumulate, repeat
+from typing import Any, Callable, Sequence
+
+NAN = math.nan
+
+
+###################################################################################################
+# Moving Averages and Volatility
+###################################################################################################
+
+def sma(values: Sequence[float], window: int) -> array:
+    """Return the simple moving average of values over window rows.
+
+    Preconditions:
+        - window >= 1
+
+    >>> sma([1.0, 2.0, 3.0, 4.0, 5.0], 3).tolist()
+    [nan, nan, 2.0, 3.0, 4.0]
+    """
+    prefix = list(accumulate(values, initial=0.0))
+    result = array('d', repeat(NAN, min(window - 1, len(values))))
+    sums = map(operator.sub, prefix[window:], prefix[:-window])
+    result.extend(map(operator.mul, sums, repeat(1 / window)))
+    return result
+
+
+def ema(values: Sequence[float], span: int) -> array:
+    """Return the exponential moving average of values with a smoothing factor of 2 / (span + 1),
+    starting from the first value.
+
+    Preconditions:
+        - span >= 1
+
+    >>> ema([1.0, 2.0, 3.0], 3).tolist()
+    [1.0, 1.5, 2.25]
+    """
+    alpha = 2 / (span + 1)
+    result = array('d')
+    average = NAN
+    for value in values:
+        average = value if math.isnan(average) else average + alpha * (value - average)
+        result.append(average)
+    return result
+
+
+def rolling_std(values: Sequence[float], window: int) -> array:
+    """Return the population standard deviation of values over window rows.
+
+    Preconditions:
+        - window >= 1
+
+    >>> rolling_std([1.0, 1.0, 3.0, 3.0], 2).tolist()
+    [nan, 0.0, 1.0, 0.0]
+    """
+    prefix = list(accumulate(values, initial=0.0))
+    prefix_squares = list(accumulate(map(operator.mul, values, values), initial=0.0))
+    sums = map(operator.sub, prefix[window:], prefix[:-window])
+    sums_of_squares = map(operator.sub, prefix_squares[window:], prefix_squares[:-window])
+    result = array('d', repeat(NAN, min(window - 1, len(values))))
+    result.extend(math.sqrt(max(total_squares / window - (total / window) ** 2, 0.0))
+                  for total, total_squares in zip(sums, sums_of_squares))
+    return result
+
+
+def bollinger_bands(values: Sequence[float], window: int = 20,
+                    width: float = 2.0) -> tuple[array, array, array]:
+    """Return the middle, upper and lower Bollinger bands of values: the simple moving average over
+    window rows, plus and minus width rolling standard deviations.
+
+    >>> middle, upper, lower = bollinger_bands([1.0, 1.0, 3.0, 3.0], 2, 2)
+    >>> upper.tolist(), lower.tolist()
+    ([nan, 1.0, 4.0, 3.0], [nan, 1.0, 0.0, 3.0])
+    """
+    middle = sma(values, window)
+    deviation = rolling_std(values, window)
+    upper = array('d', (mean + width * std for mean, std in zip(middle, deviation)))
+    lower = array('d', (mean - width * std for mean, std in zip(middle, deviation)))
+    return (middle, upper, lower)
+
+
+###################################################################################################
+# Momentum
+###################################################################################################
+
+def rsi(values: Sequence[float], period: int = 14) -> array:
+    """Return the relative strength index of values, using Wilder's smoothing over period rows.
+
+    Preconditions:
+        - period >= 1
+
+    >>> rsi([1.0, 2.0, 3.0, 2.0, 3.0], 2).tolist()
+    [nan, nan, 100.0, 50.0, 75.0]
+    """
+    result = array('d', repeat(NAN, min(period, len(values))))
+    if len(values) <= period:
+        return result
+
+    changes = list(map(operator.sub, values[1:], values[:-1]))
+    average_gain = sum(change for change in changes[:period] if change > 0) / period
+    average_loss = sum(-change for change in changes[:period] if change < 0) / period
+    result.append(_relative_strength_index(average_gain, average_loss))
+    for change in changes[period:]:
+        average_gain = (average_gain * (period - 1) + max(change, 0.0)) / period
+        average_loss = (average_loss * (period - 1) + max(-change, 0.0)) / period
+        result.append(_relative_strength_index(average_gain, average_loss))
+    return result
+
+
+def _relative_strength_index(average_gain: float, average_loss: float) -> float:
+    """Return the relative strength index for the given average gain and average loss."""
+    if average_loss == 0:
+        return 100.0 if average_gain > 0 else 50.0
+    return 100.0 - 100.0 / (1.0 + average_gain / average_loss)
+
+
+def macd(values: Sequence[float], fast: int = 12, slow: int = 26,
+         signal: int = 9) -> tuple[array, array, array]:
+    """Return the MACD line (the fast minus the slow exponential moving average of values), its
+    signal line and their difference, the histogram.
+    """
+    line = array('d', map(operator.sub, ema(values, fast), ema(values, slow)))
+    signal_line = ema(line, signal)
+    histogram = array('d', map(operator.sub, line, signal_line))
+    return (line, signal_line, histogram)
+
+
+###################################################################################################
+# Returns and Risk
+###################################################################################################
+
+def log_returns(values: Sequence[float]) -> array:
+    """Return the daily log returns of values, log(values[i] / values[i - 1]).
+
+    >>> [round(value, 4) for value in log_returns([1.0, 2.0, 1.0])]
+    [nan, 0.6931, -0.6931]
+    """
+    result = array('d', repeat(NAN, min(1, len(values))))
+    result.extend(map(math.log, map(operator.truediv, values[1:], values[:-1])))
+    return result
+
+
+def rolling_max_drawdown(values: Sequence[float], window: int) -> array:
+    """Return, for each row, the drawdown of values from their maximum over the last window rows, as
+    a fraction (0.0 at a new high, -0.5 when the price halved).
+
+    The rolling maximum is kept in a monotonic deque, so each row is pushed and popped at most once.
+
+    Preconditions:
+        - window >= 1
+        - all(value > 0 for value in values)
+
+    >>> rolling_max_drawdown([4.0, 2.0, 3.0, 1.0], 2).tolist()
+    [0.0, -0.5, 0.0, -0.6666666666666667]
+    """
+    result = array('d')
+    candidates = deque()
+    for i, value in enumerate(values):
+        while candidates and values[candidates[-1]] <= value:
+            candidates.pop()
+        candidates.append(i)
+        if candidates[0] <= i - window:
+            candidates.popleft()
+        result.append(value / values[candidates[0]] - 1.0)
+    return result
+
+
+###################################################################################################
+# Computing Indicators by Name
+###################################################################################################
+# INDICATORS maps the name of each indicator to the function computing it from the close prices and
+# to the names of the lines it returns. Indicators in PRICE_SCALE_INDICATORS are in the same unit as
+# the prices, so they can be drawn on the same axis.
+
+INDICATORS: dict[str, tuple[Callable[..., Any], tuple[str, ...]]] = {
+    'sma': (sma, ('sma',)),
+    'ema': (ema, ('ema',)),
+    'std': (rolling_std, ('std',)),
+    'bollinger': (bollinger_bands, ('middle', 'upper', 'lower')),
+    'rsi': (rsi, ('rsi',)),
+    'macd': (macd, ('macd', 'signal', 'histogram')),
+    'drawdown': (rolling_max_drawdown, ('drawdown',)),
+    'log_returns': (log_returns, ('log_returns',)),
+}
+PRICE_SCALE_INDICATORS = ('sma', 'ema', 'bollinger')
+
+# _PARAMETERS maps the name of each indicator to the names of the parameters it accepts, in order,
+# and how many of them are required. Every parameter is a number of rows, except the width of the
+# Bollinger bands, which is a number of standard deviations.
+_PARAMETERS: dict[str, tuple[tuple[str, ...], int]] = {
+    'sma': (('window',), 1),
+    'ema': (('span',), 1),
+    'std': (('window',), 1),
+    'bollinger': (('window', 'width'), 0),
+    'rsi': (('period',), 0),
+    'macd': (('fast', 'slow', 'signal'), 0),
+    'drawdown': (('window',), 1),
+    'log_returns': ((), 0),
+}
+
+
+def parse_indicator(spec: str) -> tuple[str, tuple[float, ...]]:
+    """Return the name and the parameters of the indicator spec.
+
+    >>> parse_indicator('bollinger:20:2.5')
+    ('bollinger', (20, 2.5))
+    >>> parse_indicator('vwap')
+    Traceback (most recent call last):
+    ...
+    ValueError: unknown indicator 'vwap'
+    >>> parse_indicator('sma:0')
+    Traceback (most recent call last):
+    ...
+    ValueError: invalid window 0 in indicator 'sma:0'
+    """
+    name, *parameters = spec.split(':')
+    if name not in INDICATORS:
+        raise ValueError(f'unknown indicator {name!r}')
+    try:
+        values = tuple(int(parameter) if parameter.isdigit() else float(parameter)
+                       for parameter in parameters)
+    except ValueError:
+        raise ValueError(f'invalid parameters in indicator {spec!r}') from None
+
+    names, required = _PARAMETERS[name]
+    if not required <= len(values) <= len(names):
+        usage = ':'.join((name,) + names)
+        raise ValueError(f'invalid number of parameters in indicator {spec!r}, expected {usage}')
+    for parameter_name, value in zip(names, values):
+        if parameter_name == 'width':
+            valid = math.isfinite(value) and value > 0
+        else:
+            valid = isinstance(value, int) and value >= 1
+        if not valid:
+            raise ValueError(f'invalid {parameter_name} {value!r} in indicator {spec!r}')
+    return (name, values)
+
+
+class IndicatorCache:
+    """A thread-safe, memory-bounded LRU cache of computed indicators, keyed by stock, indicator and
+    parameters.
+
+    A cached result is only reused while the stock has the same close column object, number of rows
+    and last day as when it was computed. The column is held through a weak reference and compared
+    by identity, since the id of a column that has been freed can be reused by a new one, and the
+    result is dropped as soon as the column is freed, e.g. when its stock leaves the cache of loaded
+    stocks.
+
+    Instance Attributes:
+      - max_bytes: the maximum number of bytes of results kept in the cache
+
+    Representation Invariants:
+      - self.max_bytes >= 0
+      - self._nbytes <= self.max_bytes
+    """
+    max_bytes: int
+    # Private Instance Attributes:
+    #   - _entries: maps (stock name, indicator name, parameters) to a weak reference to the close
+    #     column, the number of rows and the last day of the stock when the result was computed,
+    #     and the result itself, from least to most recently used
+    #   - _nbytes: the total number of bytes of the cached results
+    #   - _freed: the keys and weak references of the entries whose column was freed while _lock
+    #     was held, to be removed before it is released
+    #   - _lock: guards every attribute above
+    _entries: OrderedDict[tuple, tuple[weakref.ref, int, Any, tuple[array, ...]]]
+    _nbytes: int
+    _freed: list[tuple[tuple, weakref.ref]]
+    _lock: threading.Lock
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        """Initialize a new, empty IndicatorCache holding at most max_bytes of results."""
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._freed = []
+        self._lock = threading.Lock()
+
+    def compute(self, stock: Any, spec: str) -> dict[str, array]:
+        """Return the lines of the indicator spec over the close prices of stock, a StockTracking
+        object, mapped from their names.
+        """
+        name, parameters = parse_indicator(spec)
+        key = (stock.stock_name, name, parameters)
+        rows = len(stock.days)
+        last_day = stock.days[-1] if rows else None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0]() is stock.close and entry[1:3] == (rows, last_day):
+                self._entries.move_to_end(key)
+                self._remove_freed()
+                return dict(zip(INDICATORS[name][1], entry[3]))
+
+        function, line_names = INDICATORS[name]
+        result = function(stock.close, *parameters)
+        lines = result if isinstance(result, tuple) else (result,)
+        column = weakref.ref(stock.close, lambda reference: self._forget(key, reference))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if _nbytes(lines) <= self.max_bytes:
+                self._entries[key] = (column, rows, last_day, lines)
+                self._nbytes += _nbytes(lines)
+                while self._nbytes > self.max_bytes:
+                    self._remove(next(iter(self._entries)))
+            self._remove_freed()
+        return dict(zip(line_names, lines))
+
+    def clear(self) -> None:
+        """Remove every cached result."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self._freed.clear()
+
+    def _forget(self, key: tuple, column: weakref.ref) -> None:
+        """Remove the entry of key if it still holds column, a weak reference to a column that has
+        just been freed.
+
+        This is called by the garbage collector, possibly while this or another thread holds _lock,
+        in which case the entry is left for that thread to remove.
+        """
+        self._freed.append((key, column))
+        if self._lock.acquire(blocking=False):
+            try:
+                self._remove_freed()
+            finally:
+                self._lock.release()
+
+    def _remove_freed(self) -> None:
+        """Remove the entries whose column has been freed.
+
+        Preconditions:
+            - self._lock is held
+        """
+        while self._freed:
+            key, column = self._freed.pop()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is column:
+                self._remove(key)
+
+    def _remove(self, key: tuple) -> None:
+        """Remove the entry of key.
+
+        Preconditions:
+            - self._lock is held
+            - key in self._entries
+        """
+        self._nbytes -= _nbytes(self._entries.pop(key)[3])
+
+
+def _nbytes(lines: tuple[array, ...]) -> int:
+    """Return the number of bytes of the arrays in lines."""
+    return sum(len(line) * line.itemsize for line in lines)
+
+
+_indicator_cache = IndicatorCache()
+
+
+def compute_indicator(stock: Any, spec: str) -> dict[str, array]:
+    """Return the lines of the indicator spec over the close prices of stock, a StockTracking
+    object, using the shared cache of computed indicators.
+    """
+    return _indicator_cache.compute(stock, spec)
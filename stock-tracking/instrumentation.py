@@ -0,0 +1,223 @@
+"""Stock Price Tracking and Analysis Project: Instrumentation
+
+This module measures where the time goes in a call such as plot_stocks. The functions of the
+project mark their stages (reading a file, parsing it, slicing a time period, building and writing
+the figure) with stage, and count the rows and bytes they handle with count. Nothing is recorded
+unless a report is active, so the marks cost almost nothing otherwise.
+
+A report is activated with the context manager timing_report, which can also run cProfile and
+tracemalloc around the call:
+
+    >>> with timing_report('example') as report:
+    ...     with stage('work'):
+    ...         count('rows', 10)
+    >>> report.stages['work']['calls'], report.counters['rows']
+    (1, 10)
+
+Setting the environment variable STOCK_TRACKING_PROFILE makes every plot call emit its report as a
+line of JSON: to standard error if it is '1', or appended to the file it names otherwise.
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2022 Aryaman Sharma.
+"""
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+PROFILE_ENVIRONMENT_VARIABLE = 'STOCK_TRACKING_PROFILE'
+
+
+class Report:
+    """The timings and counters recorded during one call.
+
+    Instance Attributes:
+      - label: the name of the call
+      - details: extra information about the call, such as its arguments
+      - stages: maps each stage name to the number of times it ran and its total time in seconds
+      - counters: maps each counter name to its total
+      - total_s: the time taken by the whole call, in seconds, once it has finished
+      - extras: results of the optional cProfile and tracemalloc captures
+    """
+    label: str
+    details: dict[str, Any]
+    stages: dict[str, dict[str, float]]
+    counters: dict[str, int]
+    total_s: float
+    extras: dict[str, Any]
+    # Private Instance Attributes:
+    #   - _lock: guards stages and counters, which may be updated from several threads
+    _lock: threading.Lock
+
+    def __init__(self, label: str, details: Optional[dict[str, Any]] = None) -> None:
+        """Initialize a new, empty Report."""
+        self.label = label
+        self.details = details or {}
+        self.stages = {}
+        self.counters = {}
+        self.total_s = 0.0
+        self.extras = {}
+        self._lock = threading.Lock()
+
+    def record_stage(self, name: str, seconds: float) -> None:
+        """Add one run of the stage name, which took seconds, to this report."""
+        with self._lock:
+            entry = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0})
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+
+    def add_count(self, name: str, value: int) -> None:
+        """Add value to the counter name."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, recorded: dict[str, Any]) -> None:
+        """Add the stages and counters of recorded, returned by Report.to_dict, to this report."""
+        with self._lock:
+            for name, entry in recorded['stages'].items():
+                own = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0})
+                own['calls'] += entry['calls']
+                own['seconds'] += entry['seconds']
+            for name, value in recorded['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return this report as a dictionary that can be written as JSON."""
+        with self._lock:
+            return {'label': self.label, 'details': self.details, 'total_s': self.total_s,
+                    'stages': {name: dict(entry) for name, entry in self.stages.items()},
+                    'counters': dict(self.counters), **self.extras}
+
+    def to_json(self) -> str:
+        """Return this report as one line of JSON."""
+        return json.dumps(self.to_dict(), default=str)
+
+
+_current_report: contextvars.ContextVar[Optional[Report]] = contextvars.ContextVar(
+    'current_report', default=None)
+
+
+def current_report() -> Optional[Report]:
+    """Return the active report, or None if there is none."""
+    return _current_report.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the body of the with statement as a run of the stage name of the active report."""
+    report = _current_report.get()
+    if report is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        report.record_stage(name, time.perf_counter() - start)
+
+
+def count(name: str, value: int) -> None:
+    """Add value to the counter name of the active report, if there is one."""
+    report = _current_report.get()
+    if report is not None:
+        report.add_count(name, value)
+
+
+def merge_recorded(recorded: Optional[dict[str, Any]]) -> None:
+    """Add the stages and counters of recorded, a report returned by Report.to_dict in another
+    process, to the active report, if there is one and recorded is not None.
+    """
+    report = _current_report.get()
+    if report is not None and recorded is not None:
+        report.merge(recorded)
+
+
+@contextmanager
+def timing_report(label: str, profile: bool = False, trace_memory: bool = False,
+                  emit: Optional[str] = None, **details: Any) -> Iterator[Report]:
+    """Activate a new Report named label for the body of the with statement, and yield it.
+
+    If profile is True, the body runs under cProfile and the report gets the 25 functions with the
+    highest cumulative time. If trace_memory is True, the body runs under tracemalloc and the report
+    gets the peak memory traced and the 10 lines that allocated the most. If emit is given, the
+    report is written as a line of JSON when the body ends: to standard error if emit is '1' or
+    '-', or appended to the file emit otherwise.
+    """
+    report = Report(label, details)
+    token = _current_report.set(report)
+    profiler = cProfile.Profile() if profile else None
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield report
+    finally:
+        report.total_s = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+            report.extras['profile'] = _profile_summary(profiler)
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            report.extras['memory'] = {
+                'peak_bytes': tracemalloc.get_traced_memory()[1],
+                'top': [str(statistic) for statistic in snapshot.statistics('lineno')[:10]]}
+            if started_tracing:
+                tracemalloc.stop()
+        _current_report.reset(token)
+        if emit:
+            emit_report(report, emit)
+
+
+def _profile_summary(profiler: cProfile.Profile) -> str:
+    """Return the 25 functions with the highest cumulative time recorded by profiler, as text."""
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(25)
+    return output.getvalue()
+
+
+def emit_report(report: Report, destination: str) -> None:
+    """Write report as a line of JSON to standard error if destination is '1' or '-', or append it
+    to the file destination otherwise.
+    """
+    if destination in ('1', '-'):
+        print(report.to_json(), file=sys.stderr)
+    else:
+        with open(destination, 'a', encoding='utf-8') as file:
+            file.write(report.to_json() + '\n')
+
+
+@contextmanager
+def maybe_report(label: str, **details: Any) -> Iterator[None]:
+    """Activate and emit a report for the body of the with statement if the environment variable
+    STOCK_TRACKING_PROFILE is set and no report is active yet.
+    """
+    destination = os.environ.get(PROFILE_ENVIRONMENT_VARIABLE)
+    if not destination or destination == '0' or _current_report.get() is not None:
+        yield
+        return
+    with timing_report(label, emit=destination, **details):
+        yield
+
+
+def profile_call(function: Callable, *args: Any, profile: bool = True,
+                 trace_memory: bool = True, **kwargs: Any) -> tuple[Any, Report]:
+    """Return the result of function(*args, **kwargs) and the report of the call, captured with
+    cProfile and tracemalloc unless profile or trace_memory are False.
+    """
+    with timing_report(getattr(function, '__name__', 'call'), profile=profile,
+                       trace_memory=trace_memory) as report:
+        result = function(*args, **kwargs)
+    return (result, report)
@@ -0,0 +1,357 @@
+"""Stock Price Tracking and Analysis Project: Query Server
+
+This module serves the data and the charts of stocks over HTTP, so that a dashboard can share one
+process that keeps the stocks it has loaded in memory instead of importing the project and parsing
+the csv files itself. It only uses the standard library, and answers two kinds of GET requests:
+
+  - /series?ticker=AAPL&period=1_year returns the dates and close prices of a stock over a time
+    period as JSON. columns=open,high,low,close,adj_close,volume picks other columns, and
+    max_points=500 (with decimation=lttb or minmax) reduces the series to about that many rows.
+  - /chart?tickers=AAPL,TSLA&period=5_years returns the figure of stock_tracking.build_figure as
+    plotly JSON, or as a html page with format=html. max_points, decimation, indicators (e.g.
+    sma:50,rsi:14), chart and frequency are passed on to build_figure.
+
+/stats returns the number of requests served and coalesced and the counters of the cache of
+loaded stocks.
+
+Identical requests that arrive while one is being answered wait for its response instead of being
+answered again, and so do requests for a stock that is already being loaded. csv files are parsed
+in a pool of processes and figures are built in a pool of threads, so the event loop only ever
+parses requests and writes responses.
+
+Run it from the folder containing the csv files, for example:
+
+    python server.py --port 8050
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2022 Aryaman Sharma.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+import stock_tracking
+from decimation import DECIMATION_METHODS, decimate
+from instrumentation import current_report, merge_recorded
+from stock_tracking import PRICE_COLUMNS, StockTracking, day_to_date
+
+# Ticker symbols such as 'AAPL', 'BRK-B', '^GSPC' or 'EURUSD=X'. Anything else is rejected, since
+# the ticker names the csv file that is read.
+_TICKER_PATTERN = re.compile(r'[A-Za-z0-9^][A-Za-z0-9.^=_-]{0,19}')
+_MAX_REQUEST_BYTES = 16 * 1024
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            500: 'Internal Server Error'}
+
+
+class RequestError(Exception):
+    """Raised when a request cannot be answered, with the HTTP status code to answer it with.
+
+    Instance Attributes:
+      - status: the HTTP status code of the response
+    """
+    status: int
+
+    def __init__(self, status: int, message: str) -> None:
+        """Initialize a new RequestError with the given status code and message."""
+        super().__init__(message)
+        self.status = status
+
+
+###################################################################################################
+# Answering Queries
+###################################################################################################
+
+def _ticker(value: str) -> str:
+    """Return value if it is a valid ticker symbol, or raise a RequestError otherwise.
+
+    >>> _ticker('BRK-B')
+    'BRK-B'
+    >>> _TICKER_PATTERN.fullmatch('../secret') is None
+    True
+    """
+    if not _TICKER_PATTERN.fullmatch(value):
+        raise RequestError(400, f'invalid ticker {value!r}')
+    return value
+
+
+def _max_points(query: dict[str, str]) -> Optional[int]:
+    """Return the max_points parameter of query, or None if it is not given."""
+    if 'max_points' not in query:
+        return None
+    if not query['max_points'].isdigit() or int(query['max_points']) < 4:
+        raise RequestError(400, 'max_points must be a whole number of at least 4')
+    return int(query['max_points'])
+
+
+def series_response(stock: StockTracking, query: dict[str, str]) -> bytes:
+    """Return the JSON answer to the /series query for stock.
+
+    This runs in the pool of threads of the server.
+    """
+    columns = query.get('columns', 'close').split(',')
+    for column in columns:
+        if column not in PRICE_COLUMNS:
+            raise RequestError(400, f'unknown column {column!r}')
+    decimation = query.get('decimation', 'lttb')
+    if decimation not in DECIMATION_METHODS:
+        raise RequestError(400, f'unknown decimation method {decimation!r}')
+
+    window = stock.last(query.get('period', 'max'))
+    max_points = _max_points(query)
+    if max_points is None or len(window) <= max_points:
+        positions = range(len(window))
+    else:
+        positions = decimate(window.days, window.close, max_points, decimation)
+
+    days = window.days
+    series = {'ticker': stock.stock_name, 'period': query.get('period', 'max'),
+              'rows': len(window),
+              'dates': [day_to_date(days[i]).isoformat() for i in positions]}
+    for column in columns:
+        values = getattr(window, column)
+        series[column] = [values[i] for i in positions]
+    return json.dumps(series).encode('utf-8')
+
+
+def chart_response(query: dict[str, str]) -> tuple[str, bytes]:
+    """Return the content type and the body of the answer to the /chart query, whose stocks have
+    already been loaded.
+
+    This runs in the pool of threads of the server.
+    """
+    options = {'max_points': _max_points(query),
+               'decimation': query.get('decimation', 'lttb'),
+               'indicators': [spec for spec in query.get('indicators', '').split(',') if spec],
+               'chart': query.get('chart', 'line'),
+               'frequency': query.get('frequency') or None}
+    if options['decimation'] not in DECIMATION_METHODS:
+        raise RequestError(400, f"unknown decimation method {options['decimation']!r}")
+    if options['chart'] not in ('line', 'candlestick'):
+        raise RequestError(400, f"unknown chart {options['chart']!r}")
+    if options['frequency'] not in (None, 'auto') + stock_tracking.FREQUENCIES:
+        raise RequestError(400, f"unknown frequency {options['frequency']!r}")
+
+    figure = stock_tracking.build_figure(query['tickers'].split(','), query.get('period', 'max'),
+                                         **options)
+    if query.get('format', 'json') == 'html':
+        return ('text/html; charset=utf-8',
+                figure.to_html(include_plotlyjs='cdn').encode('utf-8'))
+    return ('application/json', figure.to_json().encode('utf-8'))
+
+
+###################################################################################################
+# The Server
+###################################################################################################
+
+class StockServer:
+    """An asyncio HTTP server answering /series and /chart queries over the csv files in the current
+    folder.
+
+    Instance Attributes:
+      - requests: the number of requests answered
+      - coalesced: the number of requests and loads that waited for an identical one in progress
+    """
+    requests: int
+    coalesced: int
+    # Private Instance Attributes:
+    #   - _processes: the pool of processes parsing csv files
+    #   - _threads: the pool of threads building responses
+    #   - _in_progress: maps the key of every request or load in progress to its task
+    _processes: ProcessPoolExecutor
+    _threads: ThreadPoolExecutor
+    _in_progress: dict[tuple, asyncio.Task]
+
+    def __init__(self, processes: Optional[int] = None, threads: Optional[int] = None) -> None:
+        """Initialize a new StockServer parsing csv files in processes processes and building
+        responses in threads threads.
+        """
+        self.requests = 0
+        self.coalesced = 0
+        # Forked workers would inherit the sockets of the connections open at the time, which would
+        # then never be closed, so the workers are started afresh instead.
+        self._processes = ProcessPoolExecutor(max_workers=processes,
+                                              mp_context=multiprocessing.get_context('spawn'))
+        self._threads = ThreadPoolExecutor(max_workers=threads)
+        self._in_progress = {}
+
+    async def _coalesce(self, key: tuple, start: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the result of the coroutine started by start, or of the one in progress with the
+        same key, if any.
+        """
+        task = self._in_progress.get(key)
+        if task is None:
+            task = asyncio.ensure_future(start())
+            self._in_progress[key] = task
+            task.add_done_callback(lambda _: self._finish(key))
+        else:
+            self.coalesced += 1
+        # Shielded, so that a client hanging up does not cancel the work for everyone waiting.
+        return await asyncio.shield(task)
+
+    def _finish(self, key: tuple) -> None:
+        """Forget the finished task of key, retrieving its exception so that it is not reported as
+        unhandled when every request waiting for it has gone.
+        """
+        task = self._in_progress.pop(key)
+        if not task.cancelled():
+            task.exception()
+
+    async def _run_in_thread(self, function: Callable, *args: Any) -> Any:
+        """Return the result of function(*args), called in the pool of threads."""
+        return await asyncio.get_running_loop().run_in_executor(self._threads, function, *args)
+
+    async def load(self, ticker: str) -> StockTracking:
+        """Return the StockTracking object of ticker, parsing its csv file in the pool of processes
+        if it is not loaded yet.
+        """
+        stock = stock_tracking.peek_stock(ticker)
+        if stock is not None:
+            return stock
+        return await self._coalesce(('load', ticker), lambda: self._read(ticker))
+
+    async def _read(self, ticker: str) -> StockTracking:
+        """Read the csv file of ticker in the pool of processes and add it to the cache of loaded
+        stocks.
+        """
+        loop = asyncio.get_running_loop()
+        signature, stock, recorded = await loop.run_in_executor(
+            self._processes, stock_tracking.read_stock_file, ticker, ticker + '.csv',
+            current_report() is not None)
+        merge_recorded(recorded)
+        stock_tracking.remember_stock(ticker, signature, stock)
+        return stock
+
+    async def answer(self, path: str, query: dict[str, str]) -> tuple[str, bytes]:
+        """Return the content type and the body of the answer to the GET request of path with the
+        parameters query.
+        """
+        if path == '/stats':
+            stats = {'requests': self.requests, 'coalesced': self.coalesced,
+                     'ticker_cache': stock_tracking.ticker_cache_stats()}
+            return ('application/json', json.dumps(stats).encode('utf-8'))
+        if path not in ('/series', '/chart'):
+            raise RequestError(404, f'unknown path {path!r}')
+
+        key = (path, tuple(sorted(query.items())))
+        return await self._coalesce(key, lambda: self._answer_query(path, query))
+
+    async def _answer_query(self, path: str, query: dict[str, str]) -> tuple[str, bytes]:
+        """Return the content type and the body of the answer to the /series or /chart query."""
+        if path == '/series':
+            stock = await self.load(_ticker(query.get('ticker', '')))
+            return ('application/json', await self._run_in_thread(series_response, stock, query))
+
+        tickers = [_ticker(ticker) for ticker in query.get('tickers', '').split(',')]
+        await asyncio.gather(*(self.load(ticker) for ticker in dict.fromkeys(tickers)))
+        return await self._run_in_thread(chart_response, query)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer the HTTP request read from reader on writer, then close the connection."""
+        try:
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            request_line = head.split(b'\r\n', 1)[0].decode('latin-1')
+            try:
+                method, target, _ = request_line.split(' ')
+            except ValueError:
+                await _respond(writer, 400, 'text/plain', b'malformed request line')
+                return
+
+            status, content_type = 200, 'application/json'
+            try:
+                if method != 'GET':
+                    raise RequestError(405, f'{method} is not supported')
+                url = urlsplit(target)
+                content_type, body = await self.answer(url.path, dict(parse_qsl(url.query)))
+            except RequestError as error:
+                status, body = error.status, _error_body(str(error))
+            except FileNotFoundError as error:
+                status, body = 404, _error_body(f'no data for {error.filename}')
+            except ValueError as error:
+                status, body = 400, _error_body(str(error))
+            except Exception as error:  # Answer the request instead of dropping the connection.
+                status, body = 500, _error_body(repr(error))
+            if status != 200:
+                content_type = 'application/json'
+            self.requests += 1
+            await _respond(writer, status, content_type, body)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8050) -> asyncio.AbstractServer:
+        """Start listening on host and port, and return the asyncio server."""
+        return await asyncio.start_server(self.handle, host, port, limit=_MAX_REQUEST_BYTES)
+
+    def close(self) -> None:
+        """Stop the pools of processes and threads."""
+        self._processes.shutdown(cancel_futures=True)
+        self._threads.shutdown(cancel_futures=True)
+
+
+def _error_body(message: str) -> bytes:
+    """Return the JSON body of an error response with message."""
+    return json.dumps({'error': message}).encode('utf-8')
+
+
+async def _respond(writer: asyncio.StreamWriter, status: int, content_type: str,
+                   body: bytes) -> None:
+    """Write an HTTP response with status, content_type and body to writer."""
+    writer.write((f'HTTP/1.1 {status} {_REASONS.get(status, "Error")}\r\n'
+                  f'Content-Type: {content_type}\r\n'
+                  f'Content-Length: {len(body)}\r\n'
+                  f'Connection: close\r\n\r\n').encode('latin-1') + body)
+    await writer.drain()
+
+
+###################################################################################################
+# Command Line
+###################################################################################################
+
+async def serve(host: str, port: int, processes: Optional[int] = None,
+                threads: Optional[int] = None) -> None:
+    """Answer queries on host and port until cancelled."""
+    server = StockServer(processes, threads)
+    listener = await server.start(host, port)
+    print(f'serving the stocks in {os.getcwd()} on http://{host}:{port}', file=sys.stderr)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Run the server described by the command line arguments argv until interrupted."""
+    parser = argparse.ArgumentParser(description='Serve the data and charts of stocks over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--data-dir', default='.', help='the folder containing the csv files')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='the number of processes parsing csv files')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='the number of threads building responses')
+    arguments = parser.parse_args(argv)
+
+    os.chdir(arguments.data_dir)
+    try:
+        asyncio.run(serve(arguments.host, arguments.port, arguments.processes, arguments.threads))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
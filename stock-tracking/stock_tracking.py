@@ -4,16 +4,19 @@ This project will provide working functions by which the stock prices for differ
 tracked and analysed by comparing the trendlines with other stocks over a period of time.
 
 To plot the data for one stock call plot_scatter_plot_1stock(time_period: str, stock_name1: str) in
-the Python Console, where time period can be 'max', '5_years', '2_years', '1_year', '1_month', or
-'15_days'.
+the Python Console. To plot the data for two stocks call plot_scatter_plot_2stocks(time_period: str,
+stock_name1: str, stock_name2: str), and to plot the data for three stocks call
+plot_scatter_plot_3stocks(time_period: str, stock_name1: str, stock_name2: str, stock_name3: str).
 
-To plot the data for two stocks call plot_scatter_plot_2stocks(time_period: str, stock_name1: str)
-in the Python Console, where time period can be 'max', '5_years', '2_years', '1_year', '1_month', or
-'15_days'.
+To plot any number of stocks at once call plot_stocks(stock_names: list[str], time_period: str),
+and to plot a candlestick chart of weekly, monthly, quarterly or yearly bars of one stock call
+plot_candlestick(stock_name: str, time_period: str).
 
-To plot the data for three stocks call plot_scatter_plot_3stocks(time_period: str, stock_name1: str)
-in the Python Console, where time period can be 'max', '5_years', '2_years', '1_year', '1_month', or
-'15_days'.
+The time period can be 'max', any number of days, weeks, months or years such as '15_days',
+'1_month', '1_year' or '10_years', or a range of ISO dates such as '2020-01-01:2020-12-31'.
+
+Setting the environment variable STOCK_TRACKING_PROFILE to '1' prints a JSON report of the time
+spent in each stage of every plot (see the instrumentation module).
 
 NOTE: the file locations can vary so in order to prevent the program from not working, save the
 stock information csv files in the same source folder for the project. Also, the file should be
@@ -27,45 +30,356 @@ Copyright and Usage Information
 
 This file is Copyright (c) 2022 Aryaman Sharma.
 """
+from __future__ import annotations
+
+import bisect
+import calendar
+import contextvars
 import datetime
+import itertools
+import json
+import math
+import mmap
+import operator
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import date
-import plotly.offline as pyo
-import plotly.graph_objs as go
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Optional, Sequence, Union
+
+from decimation import decimate
+from indicators import PRICE_SCALE_INDICATORS, compute_indicator, parse_indicator
+from instrumentation import (count, current_report, maybe_report, merge_recorded, stage,
+                             timing_report)
+
+# plotly takes a long time to import, so it is only imported by the functions drawing figures, and
+# programs that never draw one (such as the query server until its first chart) start quickly.
+if TYPE_CHECKING:
+    import plotly.graph_objs as go
 
 
 ###################################################################################################
 # Creating a Stock Tracking Class
 ###################################################################################################
 # First we create a stock tracking class named "StockTracking" with an intialiser and a method
-# called add_stock_price_info.
+# called add_stock_price_info. The data is kept column by column in typed arrays, with each date
+# stored as an integer day number (the number of days since 1970-01-01), so that a row costs 52
+# bytes instead of a tuple, a date and a float object.
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'adj_close', 'volume')
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def date_to_day(day: date) -> int:
+    """Return the number of days between 1970-01-01 and day.
+
+    >>> date_to_day(date(1970, 1, 2))
+    1
+    >>> date_to_day(date(2010, 6, 29))
+    14789
+    """
+    return day.toordinal() - _EPOCH_ORDINAL
+
+
+def day_to_date(day: int) -> date:
+    """Return the datetime.date that is day days after 1970-01-01.
+
+    >>> day_to_date(14789)
+    datetime.date(2010, 6, 29)
+    """
+    return date.fromordinal(day + _EPOCH_ORDINAL)
+
 
 class StockTracking:
     """A custom data type that represents the stock price for a specific stock on different days.
 
+    The rows are stored as parallel columns: days holds the int32 day numbers (see date_to_day) and
+    every name in PRICE_COLUMNS holds the matching float64 values. Columns grow in place, so
+    appending a row is amortized O(1). The columns of a stock read from a UniverseStore are
+    read-only memoryviews of the store instead, and are copied into arrays on the first append.
+
     Instance Attributes:
       - stock_name: the name of the specific stock
-      - stock_price_close: the closing stock price for a specific stock on a specific date
+      - days: the trading days of the stock, as day numbers since 1970-01-01
+      - open: the opening stock price on each day
+      - high: the highest stock price on each day
+      - low: the lowest stock price on each day
+      - close: the closing stock price on each day
+      - adj_close: the adjusted closing stock price on each day
+      - volume: the number of shares traded on each day
 
     Representation Invariants:
-      - all(data[1] >= 0 for data in self.stock_price_close)
+      - all(len(getattr(self, column)) == len(self.days) for column in PRICE_COLUMNS)
+      - all(price >= 0 for price in self.close)
       - len(stock_name) == 4
     """
+    __slots__ = ('stock_name', 'days') + PRICE_COLUMNS
     stock_name: str
-    stock_price_close: list[tuple[datetime, float]]
+    days: Union[array, memoryview]
+    open: Union[array, memoryview]
+    high: Union[array, memoryview]
+    low: Union[array, memoryview]
+    close: Union[array, memoryview]
+    adj_close: Union[array, memoryview]
+    volume: Union[array, memoryview]
 
     def __init__(self, stock_name: str) -> None:
         """Initialize a new StockTracking object."""
         self.stock_name = stock_name
-        self.stock_price_close = []
+        self.days = array('i')
+        for column in PRICE_COLUMNS:
+            setattr(self, column, array('d'))
+
+    @classmethod
+    def from_columns(cls, stock_name: str, days: array, columns: dict[str, array]) -> StockTracking:
+        """Return a new StockTracking object that takes ownership of the given columns.
 
-    def add_stock_price_info(self, stock_close_price: tuple[datetime, float]) -> None:
+        Preconditions:
+            - days.typecode == 'i'
+            - all(column in columns for column in PRICE_COLUMNS)
+            - all(len(columns[column]) == len(days) for column in PRICE_COLUMNS)
+        """
+        stock = cls.__new__(cls)
+        stock.stock_name = stock_name
+        stock.days = days
+        for column in PRICE_COLUMNS:
+            setattr(stock, column, columns[column])
+        return stock
+
+    def __len__(self) -> int:
+        """Return the number of trading days stored for this stock."""
+        return len(self.days)
+
+    def add_stock_price_info(self, stock_close_price: tuple[date, float]) -> None:
         """Add the tuple stock_close_price, containing a datetime object and a corresponding stock
-        price, to the instance attribute of stock_price_close which is a list of similar tuples.
+        price, as a new row. The columns other than close are unknown and are set to nan.
 
         Preconditions:
             - all(stock_close_price[0] in dates[0] for dates in self.stock_price_close)
         """
-        self.stock_price_close.append(stock_close_price)
+        nan = math.nan
+        day, close_price = stock_close_price
+        self.add_row(date_to_day(day), nan, nan, nan, close_price, nan, nan)
+
+    def add_row(self, day: int, open_price: float, high: float, low: float, close_price: float,
+                adj_close: float, volume: float) -> None:
+        """Append one full row of data for the day number day.
+
+        NOTE: a column cannot grow while a view of it returned by column_view is still alive, so
+        release (or drop) the views before appending.
+        """
+        self._make_growable()
+        self.days.append(day)
+        self.open.append(open_price)
+        self.high.append(high)
+        self.low.append(low)
+        self.close.append(close_price)
+        self.adj_close.append(adj_close)
+        self.volume.append(volume)
+
+    def extend(self, other: StockTracking) -> None:
+        """Append every row of other after the rows of this stock.
+
+        A ValueError is raised, and nothing is appended, unless the days of other are strictly
+        increasing and after the last stored day.
+
+        >>> stock = StockTracking('AAPL')
+        >>> stock.add_stock_price_info((date(2022, 6, 1), 1.0))
+        >>> later = StockTracking('AAPL')
+        >>> later.add_stock_price_info((date(2022, 6, 1), 2.0))
+        >>> stock.extend(later)
+        Traceback (most recent call last):
+        ...
+        ValueError: AAPL: 2022-06-01 is not after 2022-06-01
+        """
+        previous = self.days[-1] if self.days else _MIN_DAY
+        for day in other.days:
+            if day <= previous:
+                raise ValueError(f'{self.stock_name}: {day_to_date(day)} is not after '
+                                 f'{day_to_date(previous)}')
+            previous = day
+
+        self._make_growable()
+        self.days.extend(other.days)
+        for column in PRICE_COLUMNS:
+            getattr(self, column).extend(getattr(other, column))
+
+    def _make_growable(self) -> None:
+        """Copy the columns of this stock into arrays if they are views of a UniverseStore."""
+        if isinstance(self.days, array):
+            return
+        for column, typecode in [('days', 'i')] + [(column, 'd') for column in PRICE_COLUMNS]:
+            values = array(typecode)
+            values.frombytes(getattr(self, column).cast('B'))
+            setattr(self, column, values)
+
+    def column_view(self, column: str) -> memoryview:
+        """Return a zero-copy, read-only view of the given column ('days' or one of PRICE_COLUMNS).
+
+        >>> stock = StockTracking('AAPL')
+        >>> stock.add_stock_price_info((date(2010, 6, 29), 4.778))
+        >>> stock.column_view('close').tolist()
+        [4.778]
+        """
+        if column != 'days' and column not in PRICE_COLUMNS:
+            raise ValueError(f'unknown column {column!r}')
+        return memoryview(getattr(self, column)).toreadonly()
+
+    def dates(self) -> list[date]:
+        """Return the trading days of this stock as datetime.date objects, e.g. for plotting."""
+        return [date.fromordinal(day + _EPOCH_ORDINAL) for day in self.days]
+
+    @property
+    def stock_price_close(self) -> list[tuple[date, float]]:
+        """Return the (date, close price) tuples of this stock.
+
+        This builds a new list on each call and is kept for compatibility; prefer the columns.
+        """
+        return list(zip(self.dates(), self.close))
+
+    def nbytes(self) -> int:
+        """Return the number of bytes used by the columns of this stock."""
+        return sum(len(getattr(self, column)) * getattr(self, column).itemsize
+                   for column in ('days',) + PRICE_COLUMNS)
+
+    def index_range(self, start_day: int, end_day: int) -> tuple[int, int]:
+        """Return the half-open range of row positions whose day numbers are between start_day and
+        end_day inclusive, found by binary search over the sorted days.
+
+        Preconditions:
+            - all(self.days[i] < self.days[i + 1] for i in range(len(self.days) - 1))
+        """
+        return (bisect.bisect_left(self.days, start_day), bisect.bisect_right(self.days, end_day))
+
+    def window(self, start: date, end: date) -> StockWindow:
+        """Return a zero-copy view of the rows from start to end inclusive.
+
+        >>> stock = StockTracking('AAPL')
+        >>> for day in range(1, 6):
+        ...     stock.add_stock_price_info((date(2022, 6, day), float(day)))
+        >>> stock.window(date(2022, 6, 2), date(2022, 6, 4)).close.tolist()
+        [2.0, 3.0, 4.0]
+        """
+        start_index, end_index = self.index_range(date_to_day(start), date_to_day(end))
+        return StockWindow(self, start_index, end_index)
+
+    def last(self, time_period: str) -> StockWindow:
+        """Return a zero-copy view of the rows in the time_period ending on the last stored day.
+
+        See period_bounds for the accepted values of time_period.
+
+        >>> stock = StockTracking('AAPL')
+        >>> for day in range(1, 31):
+        ...     stock.add_stock_price_info((date(2022, 6, day), float(day)))
+        >>> len(stock.last('7_days'))
+        7
+        >>> stock.last('2022-06-10:2022-06-12').close.tolist()
+        [10.0, 11.0, 12.0]
+        """
+        if not self.days:
+            return StockWindow(self, 0, 0)
+        with stage('window'):
+            start_day, end_day = period_bounds(time_period, self.days[-1])
+            start_index, end_index = self.index_range(start_day, end_day)
+            return StockWindow(self, start_index, end_index)
+
+
+class StockWindow:
+    """A zero-copy view of consecutive rows of a StockTracking object.
+
+    NOTE: while a StockWindow is alive, the StockTracking object it views cannot grow, so windows
+    should be short-lived.
+
+    Instance Attributes:
+      - stock_name: the name of the specific stock
+      - start_index: the position of the first row of the window in the StockTracking object
+      - days: a read-only view of the day numbers of the rows
+      - open, high, low, close, adj_close, volume: read-only views of the matching columns
+    """
+    __slots__ = ('stock_name', 'start_index', 'days') + PRICE_COLUMNS
+    stock_name: str
+    start_index: int
+    days: memoryview
+    open: memoryview
+    high: memoryview
+    low: memoryview
+    close: memoryview
+    adj_close: memoryview
+    volume: memoryview
+
+    def __init__(self, stock: StockTracking, start_index: int, end_index: int) -> None:
+        """Initialize a view of the rows of stock from start_index up to but excluding end_index."""
+        self.stock_name = stock.stock_name
+        self.start_index = start_index
+        for column in ('days',) + PRICE_COLUMNS:
+            setattr(self, column, stock.column_view(column)[start_index:end_index])
+
+    def __len__(self) -> int:
+        """Return the number of rows in this window."""
+        return len(self.days)
+
+    def dates(self) -> list[date]:
+        """Return the trading days of this window as datetime.date objects, e.g. for plotting."""
+        return [date.fromordinal(day + _EPOCH_ORDINAL) for day in self.days]
+
+
+# A time period is either 'max', a number of calendar units ending on the last stored day, like
+# '15_days', '1_month' or '10_years', or an ISO date range like '2020-01-01:2020-12-31', where
+# either side may be left empty.
+
+_PERIOD_UNITS = {'day': 1, 'week': 7}
+_MIN_DAY, _MAX_DAY = -2 ** 31, 2 ** 31 - 1
+
+
+def period_bounds(time_period: str, last_day: int) -> tuple[int, int]:
+    """Return the first and last day numbers (inclusive) of time_period, for a stock whose last
+    stored day is last_day.
+
+    A period of a number of units starts the day after the same date that many units before
+    last_day, so that '7_days' covers 7 calendar days and '1_year' does not include the same date a
+    year earlier. Both ends of an ISO date range are included.
+
+    >>> [day_to_date(day) for day in period_bounds('1_year', date_to_day(date(2022, 6, 13)))]
+    [datetime.date(2021, 6, 14), datetime.date(2022, 6, 13)]
+    >>> [day_to_date(day) for day in period_bounds('1_month', date_to_day(date(2022, 3, 31)))]
+    [datetime.date(2022, 3, 1), datetime.date(2022, 3, 31)]
+    >>> [day_to_date(day) for day in period_bounds('2020-01-01:2020-12-31', 0)]
+    [datetime.date(2020, 1, 1), datetime.date(2020, 12, 31)]
+    >>> period_bounds('sometime', 0)
+    Traceback (most recent call last):
+    ...
+    ValueError: unknown time period 'sometime'
+    """
+    if time_period == 'max':
+        return (_MIN_DAY, _MAX_DAY)
+
+    if ':' in time_period:
+        start, end = time_period.split(':', 1)
+        try:
+            start_day = date_to_day(date.fromisoformat(start)) if start else _MIN_DAY
+            end_day = date_to_day(date.fromisoformat(end)) if end else _MAX_DAY
+        except ValueError:
+            raise ValueError(f'unknown time period {time_period!r}') from None
+        return (start_day, end_day)
+
+    amount, _, unit = time_period.partition('_')
+    unit = unit.rstrip('s')
+    if not amount.isdigit() or unit not in ('day', 'week', 'month', 'year'):
+        raise ValueError(f'unknown time period {time_period!r}')
+
+    if unit in _PERIOD_UNITS:
+        return (last_day - int(amount) * _PERIOD_UNITS[unit] + 1, last_day)
+
+    months = int(amount) * (12 if unit == 'year' else 1)
+    end = day_to_date(last_day)
+    year, month = divmod(end.year * 12 + end.month - 1 - months, 12)
+    month += 1
+    day = min(end.day, calendar.monthrange(year, month)[1])
+    return (date_to_day(date(year, month, day)) + 1, last_day)
 
 
 ###################################################################################################
@@ -120,6 +434,85 @@ def extract_stock_close_price(stock_data: str) -> float:
     """
     return float(stock_data.split(',')[4])
 
+
+# Parsing the file line by line with extract_date and extract_stock_close_price splits every line
+# twice and creates a date object per row. Instead, parse_day turns a date string straight into a
+# day number, and parse_stock_csv parses the whole file column by column.
+
+_month_start_days: dict[str, int] = {}
+
+
+def parse_day(original_date: str) -> int:
+    """Return the day number (see date_to_day) of original_date without creating a date object.
+
+    NOTE: original_date is in the format (YEAR-MONTH-DATE) which matches the format in the CSV file.
+
+    >>> parse_day('2010-06-29')
+    14789
+    >>> parse_day('1970-01-01')
+    0
+    """
+    month = original_date[:7]
+    month_start = _month_start_days.get(month)
+    if month_start is None:
+        year, month_number = int(month[:4]), int(month[5:7])
+        month_start = date_to_day(date(year, month_number, 1))
+        _month_start_days[month] = month_start
+    return month_start + int(original_date[8:10]) - 1
+
+
+def parse_stock_lines(stock_name: str, stock_data: list[str]) -> StockTracking:
+    """Return a StockTracking object containing every row of stock_data.
+
+    stock_data is a list of str from the csv data file, without the header.
+
+    >>> lines = ['2010-06-29,3.8,5.0,3.508,4.778,4.778,93831500',
+    ...          '2010-06-30,null,null,null,null,null,null',
+    ...          '2010-07-01,5.158,5.184,4.054,4.392,4.392,41094000']
+    >>> stock = parse_stock_lines('TSLA', lines)
+    >>> stock.dates()
+    [datetime.date(2010, 6, 29), datetime.date(2010, 7, 1)]
+    >>> stock.close.tolist()
+    [4.778, 4.392]
+    """
+    return _parse_rows(stock_name, '\n'.join(line.rstrip('\r\n') for line in stock_data))
+
+
+def parse_stock_csv(stock_name: str, text: str) -> StockTracking:
+    """Return a StockTracking object containing the data of text, the full contents of a csv file
+    downloaded from "https://finance.yahoo.com/".
+    """
+    if text.startswith('Date'):
+        text = text[text.find('\n') + 1:]
+    return _parse_rows(stock_name, text)
+
+
+def _parse_rows(stock_name: str, text: str) -> StockTracking:
+    """Return a StockTracking object containing the csv rows in text.
+
+    The whole buffer is split into fields at once and each column is then taken as a strided slice
+    and converted in a single pass, instead of splitting and converting the file line by line.
+    Rows with missing values, which Yahoo writes as 'null', are skipped.
+    """
+    text = text.replace('\r', '').strip('\n')
+    if not text:
+        return StockTracking(stock_name)
+
+    fields = text.replace('\n', ',').split(',')
+    width = len(PRICE_COLUMNS) + 1
+    if len(fields) % width != 0:
+        raise ValueError(f'{stock_name}: every row must have {width} comma-separated fields')
+    columns = [fields[i::width] for i in range(width)]
+
+    if 'null' in text:
+        keep = [all(column[row] != 'null' for column in columns) for row in range(len(columns[0]))]
+        columns = [list(itertools.compress(column, keep)) for column in columns]
+
+    days = array('i', map(parse_day, columns[0]))
+    prices = {name: array('d', map(float, values))
+              for name, values in zip(PRICE_COLUMNS, columns[1:])}
+    return StockTracking.from_columns(stock_name, days, prices)
+
 # Next, we use the function add_city_stock_data to return a dictionary of the stock name to the
 # respective StockTracking class which contains all the data of the stock close price to its
 # respective datetime.
@@ -130,14 +523,160 @@ def add_city_stock_data(stock_name: str, stock_data: list[str]) -> dict[str, Sto
 
     stock_data is a list of str from the csv data file.
     """
-    dict_so_far = {}
-    stock = StockTracking(stock_name)
-    for i in range(len(stock_data)):
-        day = extract_date(stock_data[i].split(',')[0])
-        stock_close_price = extract_stock_close_price(stock_data[i])
-        stock.add_stock_price_info((day, stock_close_price))
-    dict_so_far[stock_name] = stock
-    return dict_so_far
+    return {stock_name: parse_stock_lines(stock_name, stock_data)}
+
+
+###################################################################################################
+# Caching Parsed Data
+###################################################################################################
+# Parsing a csv file is much slower than reading the same data back in binary, so every parsed
+# stock is also written to a cache file in the CACHE_DIR folder next to its csv file. A cache file
+# is a 64 byte header followed by the columns of the stock, stored one after the other in little
+# endian order: the int32 days first, padded to 8 bytes, then the float64 columns in the order of
+# PRICE_COLUMNS. Each column has room for capacity rows, of which the first rows are used. The
+# header also records the size and modification time of the csv file, and the cache file is only
+# used while they still match.
+
+CACHE_DIR = '.stock_cache'
+_CACHE_MAGIC = b'STKC'
+_CACHE_VERSION = 1
+_CACHE_HEADER = struct.Struct('<4sIqqqq24x')
+
+
+def _cache_path(filename: str) -> str:
+    """Return the path of the cache file for the csv file filename.
+
+    >>> _cache_path(os.path.join('data', 'AAPL.csv')) == os.path.join('data', CACHE_DIR, 'AAPL.bin')
+    True
+    """
+    folder, name = os.path.split(filename)
+    return os.path.join(folder, CACHE_DIR, os.path.splitext(name)[0] + '.bin')
+
+
+def _column_offsets(capacity: int) -> list[int]:
+    """Return the byte offsets of the columns of a cache file with room for capacity rows, in the
+    order days, *PRICE_COLUMNS.
+    """
+    offset = _CACHE_HEADER.size
+    offsets = [offset]
+    offset += -(-capacity * 4 // 8) * 8
+    for _ in PRICE_COLUMNS:
+        offsets.append(offset)
+        offset += capacity * 8
+    return offsets
+
+
+def _to_little_endian(column: array) -> bytes:
+    """Return the bytes of column in little endian order."""
+    if sys.byteorder == 'little':
+        return column.tobytes()
+    swapped = array(column.typecode, column)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def write_cache(stock: StockTracking, filename: str, capacity: int = 0,
+                source: Optional[os.stat_result] = None) -> str:
+    """Write stock to the cache file of the csv file filename and return the path of the cache file.
+
+    The file is written under a temporary name and then renamed, so readers never see a partially
+    written cache file. capacity is the number of rows to reserve room for, at least len(stock).
+
+    source is the state of the csv file, taken with os.stat before stock was read from it, and is
+    recorded in the cache file. It is taken now if it is not given, which is only right if the csv
+    file cannot have changed since stock was read: otherwise a newer csv file would be trusted to
+    hold the older rows.
+    """
+    if source is None:
+        source = os.stat(filename)
+    path = _cache_path(filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rows = len(stock)
+    capacity = max(capacity, rows)
+    columns = [stock.days] + [getattr(stock, column) for column in PRICE_COLUMNS]
+
+    temporary_path = path + f'.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(_CACHE_HEADER.pack(_CACHE_MAGIC, _CACHE_VERSION, rows, capacity,
+                                      source.st_size, source.st_mtime_ns))
+        for column, offset in zip(columns, _column_offsets(capacity)):
+            file.seek(offset)
+            file.write(_to_little_endian(column))
+        file.truncate(_column_offsets(capacity)[-1] + capacity * 8)
+    os.replace(temporary_path, path)
+    return path
+
+
+def _cache_is_current(filename: str) -> bool:
+    """Return whether the csv file filename has a cache file that is up to date."""
+    try:
+        source = os.stat(filename)
+        with open(_cache_path(filename), 'rb') as file:
+            header = file.read(_CACHE_HEADER.size)
+    except OSError:
+        return False
+    if len(header) != _CACHE_HEADER.size:
+        return False
+    magic, version, _, _, size, mtime_ns = _CACHE_HEADER.unpack(header)
+    return (magic, version, size, mtime_ns) == (_CACHE_MAGIC, _CACHE_VERSION, source.st_size,
+                                                source.st_mtime_ns)
+
+
+def read_cache(stock_name: str, filename: str,
+               check_source: bool = True) -> Optional[StockTracking]:
+    """Return the StockTracking object stored in the cache file of the csv file filename, or None
+    if there is no cache file or, when check_source is True, it is out of date.
+    """
+    try:
+        source = os.stat(filename)
+        with open(_cache_path(filename), 'rb') as file:
+            header = file.read(_CACHE_HEADER.size)
+            if len(header) != _CACHE_HEADER.size:
+                return None
+            magic, version, rows, capacity, size, mtime_ns = _CACHE_HEADER.unpack(header)
+            if (magic, version) != (_CACHE_MAGIC, _CACHE_VERSION):
+                return None
+            if check_source and (size, mtime_ns) != (source.st_size, source.st_mtime_ns):
+                return None
+
+            columns = []
+            for typecode, offset in zip('i' + 'd' * len(PRICE_COLUMNS), _column_offsets(capacity)):
+                column = array(typecode)
+                file.seek(offset)
+                column.fromfile(file, rows)
+                if sys.byteorder != 'little':
+                    column.byteswap()
+                columns.append(column)
+    except (OSError, EOFError):
+        return None
+
+    return StockTracking.from_columns(stock_name, columns[0], dict(zip(PRICE_COLUMNS, columns[1:])))
+
+
+def rebuild_cache(filenames: list[str]) -> None:
+    """Parse every csv file in filenames again and rewrite its cache file."""
+    for filename in filenames:
+        stock_name = os.path.splitext(os.path.basename(filename))[0]
+        source = os.stat(filename)
+        with open(filename, 'r', encoding='utf-8') as file:
+            stock = parse_stock_csv(stock_name, file.read())
+        write_cache(stock, filename, source=source)
+
+
+def clear_cache(folder: str = '.') -> int:
+    """Delete the cache files of the csv files in folder and return how many were deleted."""
+    cache_folder = os.path.join(folder, CACHE_DIR)
+    if not os.path.isdir(cache_folder):
+        return 0
+
+    deleted = 0
+    for name in os.listdir(cache_folder):
+        if name.endswith('.bin') or name.endswith('.tmp'):
+            os.remove(os.path.join(cache_folder, name))
+            deleted += 1
+    if not os.listdir(cache_folder):
+        os.rmdir(cache_folder)
+    return deleted
 
 
 ###################################################################################################
@@ -145,80 +684,1101 @@ def add_city_stock_data(stock_name: str, stock_data: list[str]) -> dict[str, Sto
 ###################################################################################################
 # In the final steps, we first read the data in the csv file using the function read_data which
 # returns a dictionary of the stock name to the respective StockTracking class containing all the
-# data, which is added by using the function add_city_stock_data.
+# data. The whole file is read as one buffer and handed to parse_stock_csv, unless an up to date
+# cache file can be used instead.
+
+def read_data(stock_name: str, filename: str, use_cache: bool = True) -> dict[str, StockTracking]:
+    """Return an organised dictionary mapping the stock_name to the respective StockTracking object
+    when the filename is called in the function.
+
+    If use_cache is True, the data is read from the cache file of filename when it is up to date,
+    and the cache file is (re)written after parsing otherwise.
+    """
+    if use_cache:
+        with stage('read_cache'):
+            stock = read_cache(stock_name, filename)
+        if stock is not None:
+            count('rows_from_cache', len(stock))
+            count('bytes_from_cache', stock.nbytes())
+            return {stock_name: stock}
+
+    with stage('read_file'):
+        # Taken before reading, so that a csv file replaced meanwhile does not match the cache.
+        source = os.stat(filename)
+        with open(filename, 'r', encoding='utf-8') as file:
+            text = file.read()
+    count('csv_bytes', len(text))
+    with stage('parse'):
+        stock = parse_stock_csv(stock_name, text)
+    count('rows_parsed', len(stock))
+
+    if use_cache:
+        try:
+            with stage('write_cache'):
+                write_cache(stock, filename, source=source)
+        except OSError:
+            # The cache is only an optimisation, e.g. the folder may be read-only.
+            pass
+    return {stock_name: stock}
+
+
+###################################################################################################
+# Reading Very Large Files
+###################################################################################################
+# Intraday exports can be hundreds of megabytes, which read_data would hold in memory several
+# times over. stream_read_data reads such files through a pipeline of generators instead:
+# iter_csv_chunks reads the file in blocks of whole lines, iter_parsed_chunks parses each block into
+# columns, and iter_daily_bars optionally reduces minute bars to one bar per day on the fly. Only
+# one block is held as text at a time, so peak memory is bounded by the block size plus the columns
+# kept.
+
+# While a block is parsed, every field of it is briefly held as its own str object, which takes
+# about this many times the size of the block.
+_PARSE_MEMORY_FACTOR = 12
+
+
+def iter_csv_chunks(filename: str, chunk_size: int = 1024 * 1024) -> Iterator[str]:
+    """Yield the rows of the csv file filename, without its header, in blocks of whole lines of
+    about chunk_size bytes.
+    """
+    with open(filename, 'rb') as file:
+        remainder = b''
+        first = True
+        while True:
+            block = file.read(chunk_size)
+            if not block:
+                break
+            block = remainder + block
+            cut = block.rfind(b'\n') + 1
+            remainder = block[cut:]
+            text = block[:cut].decode('utf-8')
+            if first and text.startswith('Date'):
+                text = text[text.find('\n') + 1:]
+            first = first and not cut
+            if text:
+                yield text
+        if remainder.strip():
+            text = remainder.decode('utf-8')
+            if not (first and text.startswith('Date')):
+                yield text
+
+
+def iter_parsed_chunks(stock_name: str, chunks: Iterable[str]) -> Iterator[StockTracking]:
+    """Yield a StockTracking object holding the rows of each block of csv rows in chunks.
+
+    The rows of a block are not checked for order, so a block of intraday rows may repeat days.
+    """
+    for chunk in chunks:
+        yield _parse_rows(stock_name, chunk)
+
+
+def iter_daily_bars(chunks: Iterable[StockTracking]) -> Iterator[StockTracking]:
+    """Yield the rows of chunks reduced to one row per day: the first open, the highest high, the
+    lowest low, the last close and adjusted close and the total volume of the day.
+
+    A day that continues into the next chunk is held back until it is complete.
+
+    Preconditions:
+        - the rows of chunks are in increasing order of time
+    """
+    pending = None
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        bars = _reduce_segments(chunk, _segment_starts(chunk.days))
+        if pending is not None:
+            if pending.days[-1] == bars.days[0]:
+                bars = _merge_first_bar(pending, bars)
+            else:
+                yield pending
+        if len(bars) > 1:
+            complete = StockTracking(bars.stock_name)
+            complete.extend(_slice_stock(bars, 0, len(bars) - 1))
+            yield complete
+        pending = _slice_stock(bars, len(bars) - 1, len(bars))
+    if pending is not None:
+        yield pending
+
+
+def _segment_starts(keys: Sequence[int]) -> list[int]:
+    """Return the positions where a new run of equal values of keys starts.
+
+    >>> _segment_starts([5, 5, 6, 6, 6, 9])
+    [0, 2, 5]
+    """
+    if not keys:
+        return []
+    return [0] + list(itertools.compress(range(1, len(keys)),
+                                         map(operator.ne, keys[1:], keys[:-1])))
+
+
+def _reduce_segments(stock: StockTracking, starts: list[int],
+                     labels: Optional[Sequence[int]] = None) -> StockTracking:
+    """Return a StockTracking object with one row per segment of the rows of stock, where each
+    segment begins at a position in starts and ends where the next one begins.
+
+    Each row has the first open, the highest high, the lowest low, the last close and adjusted close
+    and the total volume of its segment, and is dated by the matching value of labels, or by the
+    first day of its segment if labels is None.
+
+    Preconditions:
+        - starts is sorted and starts[0] == 0 if stock has rows
+    """
+    ends = starts[1:] + [len(stock)]
+    last = [end - 1 for end in ends]
+    days = array('i', labels if labels is not None else (stock.days[start] for start in starts))
+    columns = {
+        'open': array('d', (stock.open[start] for start in starts)),
+        'high': array('d', (max(stock.high[start:end]) for start, end in zip(starts, ends))),
+        'low': array('d', (min(stock.low[start:end]) for start, end in zip(starts, ends))),
+        'close': array('d', (stock.close[i] for i in last)),
+        'adj_close': array('d', (stock.adj_close[i] for i in last)),
+        'volume': array('d', (sum(stock.volume[start:end]) for start, end in zip(starts, ends))),
+    }
+    return StockTracking.from_columns(stock.stock_name, days, columns)
+
+
+def _slice_stock(stock: StockTracking, start: int, end: int) -> StockTracking:
+    """Return a copy of the rows of stock from position start up to but excluding end."""
+    return StockTracking.from_columns(
+        stock.stock_name, array('i', stock.days[start:end]),
+        {column: array('d', getattr(stock, column)[start:end]) for column in PRICE_COLUMNS})
+
+
+def _merge_first_bar(earlier: StockTracking, bars: StockTracking) -> StockTracking:
+    """Return bars with its first row merged into the single row of earlier, which covers the
+    start of the same day.
+    """
+    merged = _slice_stock(bars, 0, len(bars))
+    merged.open[0] = earlier.open[0]
+    merged.high[0] = max(earlier.high[0], bars.high[0])
+    merged.low[0] = min(earlier.low[0], bars.low[0])
+    merged.volume[0] = earlier.volume[0] + bars.volume[0]
+    return merged
+
+
+def stream_read_data(stock_name: str, filename: str, intraday: bool = False,
+                     max_memory: int = 64 * 1024 * 1024) -> StockTracking:
+    """Return a StockTracking object containing the data of the csv file filename, read in blocks
+    so that memory use stays below about max_memory bytes.
+
+    If intraday is True, the file holds several rows per day (such as minute bars), which are
+    reduced to one row per day as they are read. A MemoryError is raised if the rows kept would
+    not fit in max_memory, and a ValueError if the (reduced) rows are not in increasing order of
+    date.
+    """
+    chunk_size = max(4096, max_memory // (2 * _PARSE_MEMORY_FACTOR))
+    chunks = iter_parsed_chunks(stock_name, iter_csv_chunks(filename, chunk_size))
+    if intraday:
+        chunks = iter_daily_bars(chunks)
+
+    stock = StockTracking(stock_name)
+    for chunk in chunks:
+        # The size the columns would have is checked before they grow, since arrays over-allocate
+        # by up to about an eighth when they do, and half of max_memory is kept for the blocks.
+        projected = (stock.nbytes() + chunk.nbytes()) * 9 // 8
+        if projected + max_memory // 2 > max_memory:
+            raise MemoryError(f'{filename} does not fit in {max_memory} bytes; '
+                              f'use intraday=True to reduce it to daily rows')
+        stock.extend(chunk)
+    return stock
+
+
+###################################################################################################
+# Resampling to Longer Bars
+###################################################################################################
+# Over a long time period, a plot of daily rows has tens of thousands of points. resample groups
+# the daily rows into weekly, monthly, quarterly or yearly bars instead. As the days are sorted, the
+# first row of each bar is found by a binary search for the first day of each calendar period, and
+# every bar is then reduced in a single pass (see _reduce_segments).
+
+FREQUENCIES = ('weekly', 'monthly', 'quarterly', 'yearly')
+
+
+def _period_starts(first_day: int, last_day: int, frequency: str) -> list[int]:
+    """Return the first day numbers of the calendar periods of frequency from the one containing
+    first_day up to the one containing last_day. Weeks start on Mondays.
+
+    >>> [day_to_date(day) for day in _period_starts(parse_day('2022-02-15'),
+    ...                                             parse_day('2022-07-01'), 'quarterly')]
+    [datetime.date(2022, 1, 1), datetime.date(2022, 4, 1), datetime.date(2022, 7, 1)]
+    """
+    if frequency == 'weekly':
+        # Day 0, 1970-01-01, was a Thursday.
+        monday = first_day - (first_day + 3) % 7
+        return list(range(monday, last_day + 1, 7))
+
+    months = {'monthly': 1, 'quarterly': 3, 'yearly': 12}.get(frequency)
+    if months is None:
+        raise ValueError(f'unknown frequency {frequency!r}')
+    first, last = day_to_date(first_day), day_to_date(last_day)
+    month = (first.year * 12 + first.month - 1) // months * months
+    starts = []
+    while month <= last.year * 12 + last.month - 1:
+        starts.append(date_to_day(date(month // 12, month % 12 + 1, 1)))
+        month += months
+    return starts
+
+
+def resample(stock: Union[StockTracking, StockWindow], frequency: str) -> StockTracking:
+    """Return the rows of stock grouped into bars of frequency, one of FREQUENCIES. Each bar is
+    dated by the first day of its calendar period and has the first open, the highest high, the
+    lowest low, the last close and adjusted close and the total volume of its rows.
+
+    >>> stock = StockTracking('AAPL')
+    >>> for day, price in [(3, 1.0), (4, 3.0), (5, 2.0), (10, 5.0)]:
+    ...     stock.add_row(parse_day(f'2022-01-{day:02d}'), price, price, price, price, price, 10)
+    >>> weekly = resample(stock, 'weekly')
+    >>> weekly.dates()
+    [datetime.date(2022, 1, 3), datetime.date(2022, 1, 10)]
+    >>> weekly.open.tolist(), weekly.high.tolist(), weekly.close.tolist(), weekly.volume.tolist()
+    ([1.0, 5.0], [3.0, 5.0], [2.0, 5.0], [30.0, 10.0])
+    """
+    name = f'{stock.stock_name}@{frequency}'
+    if len(stock) == 0:
+        return StockTracking(name)
+
+    period_starts = _period_starts(stock.days[0], stock.days[-1], frequency)
+    starts, labels = [], []
+    for period_start in period_starts:
+        start = bisect.bisect_left(stock.days, period_start)
+        if start == len(stock):
+            break
+        if starts and starts[-1] == start:
+            # The previous period has no rows, e.g. a week without trading.
+            labels[-1] = period_start
+        else:
+            starts.append(start)
+            labels.append(period_start)
+
+    bars = _reduce_segments(stock, starts, labels)
+    bars.stock_name = name
+    return bars
+
+
+def choose_frequency(first_day: int, last_day: int, max_bars: int = 500) -> Optional[str]:
+    """Return the shortest frequency of FREQUENCIES giving at most about max_bars bars between
+    first_day and last_day, or None if daily bars are few enough.
+
+    >>> choose_frequency(0, 365 * 40)
+    'monthly'
+    """
+    span = last_day - first_day + 1
+    for frequency, days in ((None, 365 / 252), ('weekly', 7), ('monthly', 30.4),
+                            ('quarterly', 91.3), ('yearly', 365.25)):
+        if span / days <= max_bars:
+            return frequency
+    return 'yearly'
+
+
+###################################################################################################
+# Adding New Days of Data
+###################################################################################################
+# A csv file downloaded again the next day only has one new row at its end. update_stock reads the
+# rows after the last stored day from the end of the csv file, appends them to the stored data and
+# writes them into the cache file in place, so the cost of an update grows with the number of new
+# rows instead of the length of the history. Yahoo revises past prices after splits and dividends,
+# so the row of the last stored day is read too, and the whole file is parsed again if it changed.
+
+def read_new_lines(filename: str, after_day: int, block_size: int = 64 * 1024) -> list[str]:
+    """Return the lines at the end of the csv file filename from the row for the day number
+    after_day on.
+
+    The file is read backwards from its end in blocks of block_size bytes, until a line before
+    after_day (or the header) is reached. If the first line returned is not the row for after_day,
+    that row is missing, or a line is out of order.
+    """
+    with open(filename, 'rb') as file:
+        position = file.seek(0, os.SEEK_END)
+        buffer = b''
+        tail = []
+        reached_start = False
+        while not reached_start:
+            step = min(block_size, position)
+            position -= step
+            file.seek(position)
+            buffer = file.read(step) + buffer
+            lines = buffer.split(b'\n')
+            # Unless the start of the file has been reached, the first line may be cut.
+            if position > 0:
+                buffer = lines[0]
+                lines = lines[1:]
+            else:
+                buffer = b''
+
+            for line in reversed(lines):
+                text = line.decode('utf-8').strip()
+                if not text:
+                    continue
+                if text.startswith('Date'):
+                    reached_start = True
+                    break
+                if parse_day(text) < after_day:
+                    reached_start = True
+                    break
+                tail.append(text)
+            reached_start = reached_start or position == 0
+
+    tail.reverse()
+    return tail
+
+
+def append_cache(stock: StockTracking, filename: str, new_rows: int,
+                 source: os.stat_result) -> None:
+    """Write the last new_rows rows of stock into the cache file of the csv file filename, recording
+    source as the state of the csv file they were read from.
+
+    The rows are written into the room reserved at the end of each column, and the header is updated
+    last, so readers never see rows that are not fully written. When there is no room left, the
+    cache file is rewritten with room for twice as many rows, which keeps appends amortized O(1).
 
-def read_data(stock_name: str, filename: str) -> dict[str, StockTracking]:
-    """Return an organised dictionary mapping city to the respective RTLBCIData object when the
-    filename is called in the function.
+    Preconditions:
+        - the cache file of filename holds exactly the first len(stock) - new_rows rows of stock
+    """
+    path = _cache_path(filename)
+    rows = len(stock)
+    with open(path, 'r+b') as file:
+        magic, version, old_rows, capacity, _, _ = _CACHE_HEADER.unpack(
+            file.read(_CACHE_HEADER.size))
+        if (magic, version, old_rows) != (_CACHE_MAGIC, _CACHE_VERSION, rows - new_rows):
+            raise ValueError(f'{path} does not match the stored data of {stock.stock_name}')
+
+        if rows <= capacity:
+            columns = [stock.days] + [getattr(stock, column) for column in PRICE_COLUMNS]
+            for column, offset in zip(columns, _column_offsets(capacity)):
+                file.seek(offset + old_rows * column.itemsize)
+                file.write(_to_little_endian(column[old_rows:]))
+            file.flush()
+            file.seek(0)
+            file.write(_CACHE_HEADER.pack(_CACHE_MAGIC, _CACHE_VERSION, rows, capacity,
+                                          source.st_size, source.st_mtime_ns))
+            return
+
+    write_cache(stock, filename, capacity=2 * rows, source=source)
+
+
+def update_stock(stock_name: str, filename: Optional[str] = None) -> int:
+    """Append the rows of the csv file filename (stock_name + '.csv' by default) that are newer than
+    the last stored day of stock_name to its cache file and to the cache of loaded stocks, and
+    return the number of rows added.
+
+    If the stock has no cache file yet, or the row of its last stored day has changed in the csv
+    file (e.g. its prices were adjusted after a split), the whole csv file is parsed again instead.
+    A ValueError is raised if the rows are not in increasing order of date.
     """
+    if filename is None:
+        filename = stock_name + '.csv'
+    source = os.stat(filename)
+    stock = read_cache(stock_name, filename, check_source=False)
+    last_day = stock.days[-1] if stock is not None and len(stock) > 0 else None
+    if last_day is not None:
+        lines = read_new_lines(filename, last_day)
+        if lines and parse_day(lines[0]) == last_day and _is_last_row(stock, lines[0]):
+            new_stock = parse_stock_lines(stock_name, lines[1:])
+            stock.extend(new_stock)
+            append_cache(stock, filename, len(new_stock), source)
+            _ticker_cache.put(stock_name, filename, (source.st_size, source.st_mtime_ns), stock)
+            return len(new_stock)
+
     with open(filename, 'r', encoding='utf-8') as file:
-        stock_data = file.readlines()
+        stock = parse_stock_csv(stock_name, file.read())
+    for previous, day in zip(stock.days, itertools.islice(stock.days, 1, None)):
+        if day <= previous:
+            raise ValueError(f'{filename}: {day_to_date(day)} is not after '
+                             f'{day_to_date(previous)}')
+    write_cache(stock, filename, source=source)
+    _ticker_cache.put(stock_name, filename, (source.st_size, source.st_mtime_ns), stock)
+    if last_day is None:
+        return 0
+    return len(stock) - bisect.bisect_right(stock.days, last_day)
+
+
+def _is_last_row(stock: StockTracking, line: str) -> bool:
+    """Return whether the csv row line holds the same prices as the last stored row of stock."""
+    row = parse_stock_lines(stock.stock_name, [line])
+    return len(row) == 1 and all(getattr(row, column)[0] == getattr(stock, column)[-1]
+                                 for column in PRICE_COLUMNS)
 
-    return add_city_stock_data(stock_name, stock_data[1:])
+
+###################################################################################################
+# Storing a Whole Universe of Stocks
+###################################################################################################
+# Opening thousands of csv or cache files one by one is slow, so a whole universe of stocks can be
+# stored in a single file instead. The file starts with a 64 byte header pointing to an index, a
+# JSON object mapping each stock name to the offset and the number of rows of its block. A block
+# holds the columns of one stock in the same layout as a cache file. New blocks and a new index are
+# always written after the existing data and the header is updated last, so adding stocks never
+# rewrites existing blocks, and a reader never sees a partially written store.
+#
+# A UniverseStore maps the file into memory and only reads the index when it is opened; the
+# StockTracking objects it returns are views of the mapped file, so only the pages of the stocks
+# that are actually used are ever read from disk.
+
+_UNIVERSE_MAGIC = b'STKU'
+_UNIVERSE_VERSION = 1
+_UNIVERSE_HEADER = struct.Struct('<4sIqq40x')
+
+
+def _block_size(rows: int) -> int:
+    """Return the number of bytes of a block of rows rows in a universe store."""
+    return _column_offsets(rows)[-1] + rows * 8 - _CACHE_HEADER.size
+
+
+def add_to_universe(path: str, stocks: list[StockTracking]) -> None:
+    """Add stocks to the universe store at path, creating it if it does not exist. A stock that is
+    already in the store is replaced.
+    """
+    if not os.path.exists(path):
+        with open(path, 'wb') as file:
+            file.write(_UNIVERSE_HEADER.pack(_UNIVERSE_MAGIC, _UNIVERSE_VERSION, 0, 0))
+
+    with open(path, 'r+b') as file:
+        magic, version, index_offset, index_length = _UNIVERSE_HEADER.unpack(
+            file.read(_UNIVERSE_HEADER.size))
+        if (magic, version) != (_UNIVERSE_MAGIC, _UNIVERSE_VERSION):
+            raise ValueError(f'{path} is not a universe store')
+        index = {}
+        if index_length:
+            file.seek(index_offset)
+            index = json.loads(file.read(index_length))
+
+        offset = file.seek(0, os.SEEK_END)
+        for stock in stocks:
+            offset += -offset % 8
+            rows = len(stock)
+            columns = [stock.days] + [getattr(stock, column) for column in PRICE_COLUMNS]
+            for column, column_offset in zip(columns, _column_offsets(rows)):
+                file.seek(offset + column_offset - _CACHE_HEADER.size)
+                file.write(_to_little_endian(column))
+            index[stock.stock_name] = [offset, rows]
+            offset += _block_size(rows)
+
+        index_bytes = json.dumps(index, separators=(',', ':')).encode('utf-8')
+        file.seek(offset)
+        file.write(index_bytes)
+        file.flush()
+        file.seek(0)
+        file.write(_UNIVERSE_HEADER.pack(_UNIVERSE_MAGIC, _UNIVERSE_VERSION, offset,
+                                         len(index_bytes)))
+
+
+def build_universe(path: str, filenames: list[str]) -> None:
+    """Create the universe store at path from the csv files in filenames, replacing any existing
+    store. Each stock is named after its csv file.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    batch = []
+    for filename in filenames:
+        stock_name = os.path.splitext(os.path.basename(filename))[0]
+        batch.append(read_data(stock_name, filename)[stock_name])
+        if len(batch) == 256:
+            add_to_universe(path, batch)
+            batch = []
+    add_to_universe(path, batch)
+
+
+class UniverseStore:
+    """A read-only, memory-mapped universe store created by build_universe.
+
+    The StockTracking objects returned by get are zero-copy views of the mapped file. They are
+    copied into memory the first time a row is appended to them.
+
+    Instance Attributes:
+      - path: the path of the store
+      - index: maps each stock name to the offset and the number of rows of its block
+    """
+    path: str
+    index: dict[str, list[int]]
+    # Private Instance Attributes:
+    #   - _file: the open store file
+    #   - _map: the memory map of _file
+    #   - _stocks: the StockTracking objects already returned by get, so that each stock is only
+    #     viewed once and results cached per stock (such as indicators) can be reused
+    _file: Any
+    _map: mmap.mmap
+    _stocks: dict[str, StockTracking]
+
+    def __init__(self, path: str) -> None:
+        """Open the universe store at path."""
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_offset, index_length = _UNIVERSE_HEADER.unpack_from(self._map)
+        if (magic, version) != (_UNIVERSE_MAGIC, _UNIVERSE_VERSION):
+            self.close()
+            raise ValueError(f'{path} is not a universe store')
+        self.index = json.loads(self._map[index_offset:index_offset + index_length] or b'{}')
+        self._stocks = {}
+
+    def __contains__(self, stock_name: str) -> bool:
+        """Return whether stock_name is in this store."""
+        return stock_name in self.index
+
+    def __len__(self) -> int:
+        """Return the number of stocks in this store."""
+        return len(self.index)
+
+    def __enter__(self) -> UniverseStore:
+        """Return this store, to be used in a with statement."""
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Close this store at the end of a with statement."""
+        self.close()
+
+    def get(self, stock_name: str) -> StockTracking:
+        """Return a StockTracking object viewing the data of stock_name in this store.
+
+        A KeyError is raised if stock_name is not in this store. The same object is returned on
+        every call, so, like the objects returned by load_stock, it should not be modified.
+        """
+        stock = self._stocks.get(stock_name)
+        if stock is not None:
+            return stock
+
+        offset, rows = self.index[stock_name]
+        view = memoryview(self._map)
+        columns = []
+        for typecode, column_offset in zip('i' + 'd' * len(PRICE_COLUMNS), _column_offsets(rows)):
+            start = offset + column_offset - _CACHE_HEADER.size
+            column = view[start:start + rows * (4 if typecode == 'i' else 8)].cast(typecode)
+            if sys.byteorder != 'little':
+                column = array(typecode, column)
+                column.byteswap()
+            columns.append(column)
+        stock = StockTracking.from_columns(stock_name, columns[0],
+                                           dict(zip(PRICE_COLUMNS, columns[1:])))
+        self._stocks[stock_name] = stock
+        return stock
+
+    def close(self) -> None:
+        """Close this store. The StockTracking objects returned by get must not be used after."""
+        self._stocks.clear()
+        try:
+            self._map.close()
+        except BufferError:
+            # Some stocks are still referenced elsewhere; the map is released with the last of them.
+            pass
+        self._file.close()
+
+
+_universe_store: Optional[UniverseStore] = None
+
+
+def open_universe(path: Optional[str]) -> None:
+    """Make load_stock, and so the plot functions, read stocks from the universe store at path when
+    they are in it, instead of from their csv files. If path is None, stop using a universe store.
+
+    NOTE: the store is a snapshot; changes to the csv files are not seen until the store is rebuilt.
+    """
+    global _universe_store
+    previous = _universe_store
+    _universe_store = UniverseStore(path) if path is not None else None
+    if previous is not None:
+        previous.close()
+
+
+###################################################################################################
+# Keeping Loaded Stocks in Memory
+###################################################################################################
+# Stocks that are plotted over and over again in the same session are kept in memory by a
+# TickerCache, so that they are not read from disk on every call. The cache holds at most max_bytes
+# of columns and forgets the least recently used stocks first. A stock is loaded again when the size
+# or modification time of its csv file changes.
+
+def _file_signature(filename: str) -> tuple[int, int]:
+    """Return the size and modification time in nanoseconds of filename."""
+    status = os.stat(filename)
+    return (status.st_size, status.st_mtime_ns)
+
+
+class TickerCache:
+    """A thread-safe, memory-bounded LRU cache of loaded StockTracking objects.
+
+    The StockTracking objects returned by get are shared between callers and should not be modified.
+
+    Instance Attributes:
+      - max_bytes: the maximum number of bytes of columns kept in the cache
+      - hits: the number of calls to get answered from memory
+      - misses: the number of calls to get that had to load the stock
+      - evictions: the number of stocks removed to stay within max_bytes
+
+    Representation Invariants:
+      - self.max_bytes >= 0
+      - self._nbytes <= self.max_bytes
+    """
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    # Private Instance Attributes:
+    #   - _entries: maps (stock_name, absolute csv path) to the csv file signature and the stock,
+    #     from least to most recently used
+    #   - _nbytes: the total number of bytes of the cached stocks
+    #   - _lock: guards every attribute above
+    #   - _loading: one lock per key being loaded, so a stock is only loaded once at a time
+    _entries: OrderedDict[tuple[str, str], tuple[tuple[int, int], StockTracking]]
+    _nbytes: int
+    _lock: threading.Lock
+    _loading: dict[tuple[str, str], threading.Lock]
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024) -> None:
+        """Initialize a new, empty TickerCache holding at most max_bytes of columns."""
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def get(self, stock_name: str, filename: str) -> StockTracking:
+        """Return the StockTracking object for stock_name stored in the csv file filename, loading
+        it with read_data if it is not cached or its csv file has changed.
+        """
+        key = (stock_name, os.path.abspath(filename))
+        signature = _file_signature(filename)
+        with self._lock:
+            stock = self._lookup(key, signature)
+            if stock is not None:
+                self.hits += 1
+                return stock
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        try:
+            with key_lock:
+                with self._lock:
+                    # Another thread may have loaded the stock while this one was waiting.
+                    stock = self._lookup(key, signature)
+                    if stock is not None:
+                        self.hits += 1
+                    else:
+                        self.misses += 1
+                if stock is None:
+                    stock = read_data(stock_name, filename)[stock_name]
+                    with self._lock:
+                        self._store(key, signature, stock)
+        finally:
+            # Also when read_data fails, so that a missing or corrupt file does not leave its lock.
+            with self._lock:
+                self._loading.pop(key, None)
+        return stock
+
+    def peek(self, stock_name: str, filename: str) -> Optional[StockTracking]:
+        """Return the cached StockTracking object for stock_name and filename if it is up to date,
+        or None, without loading it.
+        """
+        key = (stock_name, os.path.abspath(filename))
+        signature = _file_signature(filename)
+        with self._lock:
+            stock = self._lookup(key, signature)
+            if stock is not None:
+                self.hits += 1
+            return stock
+
+    def put(self, stock_name: str, filename: str, signature: tuple[int, int],
+            stock: StockTracking) -> None:
+        """Cache stock, loaded elsewhere from the csv file filename whose signature (see
+        _file_signature) was taken before it was read.
+        """
+        with self._lock:
+            self.misses += 1
+            self._store((stock_name, os.path.abspath(filename)), signature, stock)
+
+    def invalidate(self, filename: str) -> None:
+        """Remove every cached stock loaded from the csv file filename."""
+        path = os.path.abspath(filename)
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == path]:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Remove every cached stock and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def resize(self, max_bytes: int) -> None:
+        """Change max_bytes, evicting stocks if the cache no longer fits."""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def stats(self) -> dict[str, int]:
+        """Return the counters and the current size of the cache."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'stocks': len(self._entries), 'nbytes': self._nbytes,
+                    'max_bytes': self.max_bytes}
+
+    def _lookup(self, key: tuple[str, str], signature: tuple[int, int]) -> Optional[StockTracking]:
+        """Return the cached stock for key if it was loaded from a file with signature, marking it
+        as the most recently used. Out of date entries are removed.
+
+        Preconditions:
+            - self._lock is held
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] != signature:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _store(self, key: tuple[str, str], signature: tuple[int, int],
+               stock: StockTracking) -> None:
+        """Cache stock under key, unless it is larger than max_bytes on its own.
+
+        Preconditions:
+            - self._lock is held
+        """
+        if key in self._entries:
+            self._remove(key)
+        if stock.nbytes() > self.max_bytes:
+            return
+        self._entries[key] = (signature, stock)
+        self._nbytes += stock.nbytes()
+        self._evict()
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        """Remove key from the cache.
+
+        Preconditions:
+            - self._lock is held
+            - key in self._entries
+        """
+        _, stock = self._entries.pop(key)
+        self._nbytes -= stock.nbytes()
+
+    def _evict(self) -> None:
+        """Remove the least recently used stocks until the cache fits in max_bytes.
+
+        Preconditions:
+            - self._lock is held
+        """
+        while self._nbytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+
+_ticker_cache = TickerCache()
+
+
+def configure_ticker_cache(max_bytes: int) -> None:
+    """Set the memory budget in bytes of the cache of loaded stocks shared by the plot functions."""
+    _ticker_cache.resize(max_bytes)
+
+
+def clear_ticker_cache() -> None:
+    """Forget every stock in the cache of loaded stocks shared by the plot functions."""
+    _ticker_cache.clear()
+
+
+def ticker_cache_stats() -> dict[str, int]:
+    """Return the hit, miss and eviction counters of the cache of loaded stocks."""
+    return _ticker_cache.stats()
+
+
+def peek_stock(stock_name: str) -> Optional[StockTracking]:
+    """Return the StockTracking object for stock_name if it is in the universe store or in the cache
+    of loaded stocks and up to date, or None, without loading it.
+    """
+    store = _universe_store
+    if store is not None and stock_name in store:
+        return store.get(stock_name)
+    return _ticker_cache.peek(stock_name, stock_name + '.csv')
+
+
+def remember_stock(stock_name: str, signature: tuple[int, int], stock: StockTracking) -> None:
+    """Add stock, read elsewhere from the file stock_name + '.csv' whose signature was taken before
+    it was read (see read_stock_file), to the cache of loaded stocks.
+    """
+    _ticker_cache.put(stock_name, stock_name + '.csv', signature, stock)
+
+
+def load_stock(stock_name: str) -> StockTracking:
+    """Return the StockTracking object for stock_name, read from the file stock_name + '.csv'.
+
+    The object is shared through the cache of loaded stocks, or read from the universe store opened
+    with open_universe if the stock is in it, and should not be modified.
+    """
+    store = _universe_store
+    if store is not None and stock_name in store:
+        return store.get(stock_name)
+    return _ticker_cache.get(stock_name, stock_name + '.csv')
 
 
 ###################################################################################################
 # Data Representation as Scatterplot
 ###################################################################################################
-# This final part of the project introduces 3 new functions plot_scatter_plot_1stock,
-# plot_scatter_plot_2stocks and plot_scatter_plot_3stocks along with a helper function _extract_data
-# which will allow us to finally plot scatterplots with the desired number of stocks and the
-# desired time period.
+# This final part of the project introduces the function plot_stocks, which plots scatterplots
+# with any number of stocks and the desired time period, along with the shortcuts
+# plot_scatter_plot_1stock, plot_scatter_plot_2stocks and plot_scatter_plot_3stocks and a helper
+# function _extract_data.
+
+def load_stocks(stock_names: list[str], use_processes: Optional[bool] = False,
+                max_workers: Optional[int] = None) -> dict[str, StockTracking]:
+    """Return a dictionary mapping each name in stock_names to its StockTracking object.
+
+    Stocks that are not in the cache of loaded stocks are loaded concurrently, so loading many
+    stocks takes about as long as loading the slowest one. By default they are loaded in a pool of
+    threads. Parsing a csv file holds the GIL, so use_processes=True parses every stock in a pool
+    of processes instead, and use_processes=None parses in processes only the csv files without an
+    up to date binary cache file, when there are several of them, and reads the others in threads.
+
+    Processes are only used when asked for, since on platforms that start them with 'spawn' the
+    calling script must be guarded by if __name__ == '__main__'.
+    """
+    unique_names = list(dict.fromkeys(stock_names))
+    if len(unique_names) <= 1:
+        return {stock_name: load_stock(stock_name) for stock_name in unique_names}
+
+    stocks = {}
+    missing = []
+    for stock_name in unique_names:
+        # Stocks in the universe store are never read from their csv files, which may not exist.
+        stock = peek_stock(stock_name)
+        if stock is None:
+            missing.append(stock_name)
+        else:
+            stocks[stock_name] = stock
+
+    if use_processes is None:
+        to_parse = [stock_name for stock_name in missing
+                    if not _cache_is_current(stock_name + '.csv')]
+        if len(to_parse) < 2:
+            # Starting a pool of processes takes longer than parsing one file.
+            to_parse = []
+    else:
+        to_parse = missing if use_processes else []
+    to_read = [stock_name for stock_name in missing if stock_name not in to_parse]
+
+    if to_parse:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            filenames = [stock_name + '.csv' for stock_name in to_parse]
+            # The workers cannot record in the active report, so they return what they recorded.
+            record = itertools.repeat(current_report() is not None)
+            results = executor.map(read_stock_file, to_parse, filenames, record)
+            for stock_name, filename, (signature, stock, recorded) in zip(to_parse, filenames,
+                                                                          results):
+                merge_recorded(recorded)
+                _ticker_cache.put(stock_name, filename, signature, stock)
+                stocks[stock_name] = stock
+    if len(to_read) == 1:
+        stocks[to_read[0]] = load_stock(to_read[0])
+    elif to_read:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Each thread runs in a copy of the current context, so that its stages are recorded
+            # in the active timing report, if any.
+            futures = [executor.submit(contextvars.copy_context().run, load_stock, stock_name)
+                       for stock_name in to_read]
+            for stock_name, future in zip(to_read, futures):
+                stocks[stock_name] = future.result()
+    return {stock_name: stocks[stock_name] for stock_name in unique_names}
+
+
+def read_stock_file(stock_name: str, filename: str, record: bool = False
+                    ) -> tuple[tuple[int, int], StockTracking, Optional[dict[str, Any]]]:
+    """Return the signature of the csv file filename, taken before reading it, its data, and the
+    stages and counters of reading it if record is True, or None otherwise.
+
+    This runs in a worker process of load_stocks or of the query server, where the report of the
+    caller is not active, so the caller passes record=True when it has one and adds the returned
+    stages and counters to it with merge_recorded.
+    """
+    signature = _file_signature(filename)
+    if not record:
+        return (signature, read_data(stock_name, filename)[stock_name], None)
+    with timing_report('read_stock_file') as report:
+        stock = read_data(stock_name, filename)[stock_name]
+    return (signature, stock, report.to_dict())
+
+
+def shared_period_bounds(stocks: list[StockTracking], time_period: str) -> tuple[int, int]:
+    """Return the first and last day numbers of time_period for stocks, ending on the latest day
+    stored for any of them, so that they can all be plotted on the same date axis even if some of
+    the csv files are older than others.
+    """
+    last_days = [stock.days[-1] for stock in stocks if len(stock) > 0]
+    if not last_days:
+        return (_MAX_DAY, _MIN_DAY)
+    return period_bounds(time_period, max(last_days))
 
-def plot_scatter_plot_1stock(time_period: str, stock_name1: str) -> None:
-    """Plot a scatterplot for 1 stock, i.e. stock_name1 over a fixed time_period.
 
-    NOTE: Ensure that there is a corresponding csv file for stock_name1 in the main folder of the
-    project. In case there is no existent csv file in the folder, follow the instruction in the main
-    description of the project to download the csv file from "https://finance.yahoo.com/".
+def align_windows(stocks: list[StockTracking], time_period: str) -> list[StockWindow]:
+    """Return the windows of stocks covering the same dates in time_period (see
+    shared_period_bounds).
+    """
+    start_day, end_day = shared_period_bounds(stocks, time_period)
+    return [StockWindow(stock, *stock.index_range(start_day, end_day)) for stock in stocks]
 
-    Preconditions:
-        - time_period == any('max', '5_years', '2_years', '1_year', '1_month', '15_days')
+
+def _plot_positions(window: StockWindow, max_points: Optional[int],
+                    decimation: str) -> Optional[list[int]]:
+    """Return the positions of the rows of window to plot, keeping about max_points of them with the
+    given decimation method, or None if every row should be plotted.
     """
-    extracted_data1 = _extract_data(stock_name1)
+    if max_points is None or len(window) <= max_points:
+        return None
+    return decimate(window.days, window.close, max_points, decimation)
 
-    x_stock1, y_stock1 = ([], [])
 
-    if time_period == 'max':
-        x_stock1, y_stock1 = extracted_data1
-    elif time_period == '5_years':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - (365 * 5):], \
-                             extracted_data1[1][len(extracted_data1) - (365 * 5):]
-    elif time_period == '4_years':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - (365 * 4):], \
-                             extracted_data1[1][len(extracted_data1) - (365 * 4):]
-    elif time_period == '3_years':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - (365 * 3):], \
-                             extracted_data1[1][len(extracted_data1) - (365 * 3):]
-    elif time_period == '2_years':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - (365 * 2):], \
-                             extracted_data1[1][len(extracted_data1) - (365 * 2):]
-    elif time_period == '1_year':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - 365:], \
-                             extracted_data1[1][len(extracted_data1) - 365:]
-    elif time_period == '1_month':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - 30:], \
-                             extracted_data1[1][len(extracted_data1) - 30:]
-    elif time_period == '15_days':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - 15:], \
-                             extracted_data1[1][len(extracted_data1) - 15:]
-
-    line_stock1 = go.Scatter(
-        x=x_stock1,
-        y=y_stock1,
-        mode='lines',
-        name=stock_name1
-    )
+def _pick(values: Sequence, positions: Optional[list[int]]) -> list:
+    """Return the values at positions, or all of values if positions is None."""
+    if positions is None:
+        return list(values)
+    return [values[i] for i in positions]
+
+
+def build_figure(stock_names: list[str], time_period: str, use_processes: Optional[bool] = False,
+                 max_points: Optional[int] = None, decimation: str = 'lttb',
+                 indicators: Sequence[str] = (), chart: str = 'line',
+                 frequency: Optional[str] = None) -> go.Figure:
+    """Return a figure with one line, or one set of candlesticks if chart is 'candlestick', per
+    stock in stock_names over the same time_period.
+
+    frequency is one of FREQUENCIES to plot weekly, monthly, quarterly or yearly bars instead of
+    daily rows (see resample), or 'auto' to pick the shortest of them giving at most about 500
+    bars. Candlesticks use 'auto' unless a frequency is given.
+
+    If max_points is given, each line is reduced to about max_points points with the decimation
+    method 'lttb' or 'minmax' (see the decimation module), which keeps its shape and extremes while
+    making the figure much smaller and faster to draw. Candlesticks are never decimated.
+
+    indicators is a list of indicator specs such as 'sma:200' or 'bollinger:20:2' (see the
+    indicators module) to draw over every stock. They are computed over the whole history of the
+    stock (or of its bars), so that they are defined from the start of the time period. Indicators
+    that are not in the unit of the prices, such as 'rsi:14', are drawn against a second y axis.
+    """
+    import plotly.graph_objs as go
+
+    with stage('load'):
+        stocks = load_stocks(stock_names, use_processes=use_processes)
+    originals = [stocks[stock_name] for stock_name in stock_names]
+    start_day, end_day = shared_period_bounds(originals, time_period)
+
+    if frequency is None and chart == 'candlestick':
+        frequency = 'auto'
+    if frequency == 'auto':
+        stored = [stock for stock in originals if len(stock) > 0]
+        if stored:
+            first_day = max(start_day, min(stock.days[0] for stock in stored))
+            last_day = min(end_day, max(stock.days[-1] for stock in stored))
+            frequency = choose_frequency(first_day, last_day)
+        else:
+            frequency = None
+
+    windows = []
+    series = []
+    for stock in originals:
+        if frequency is None:
+            with stage('window'):
+                start_index, end_index = stock.index_range(start_day, end_day)
+        else:
+            with stage('resample'):
+                stock = resample(stock, frequency)
+            # Keep the bar of the period containing start_day.
+            start_index = max(0, bisect.bisect_right(stock.days, start_day) - 1)
+            end_index = bisect.bisect_right(stock.days, end_day)
+        series.append(stock)
+        windows.append(StockWindow(stock, start_index, end_index))
+    count('rows_in_period', sum(len(window) for window in windows))
+
+    with stage('traces'):
+        traces = []
+        secondary_axis = False
+        for stock_name, stock, window in zip(stock_names, series, windows):
+            if chart == 'candlestick':
+                positions = None
+                x_stock = window.dates()
+                traces.append(go.Candlestick(x=x_stock, open=window.open.tolist(),
+                                             high=window.high.tolist(), low=window.low.tolist(),
+                                             close=window.close.tolist(), name=stock_name))
+            else:
+                positions = _plot_positions(window, max_points, decimation)
+                x_stock = [day_to_date(day) for day in _pick(window.days, positions)]
+                traces.append(go.Scatter(x=x_stock, y=_pick(window.close, positions), mode='lines',
+                                         name=stock_name))
+
+            start, end = window.start_index, window.start_index + len(window)
+            for spec in indicators:
+                on_price_axis = parse_indicator(spec)[0] in PRICE_SCALE_INDICATORS
+                secondary_axis = secondary_axis or not on_price_axis
+                for line_name, values in compute_indicator(stock, spec).items():
+                    overlay = memoryview(values)[start:end]
+                    traces.append(go.Scatter(x=x_stock, y=_pick(overlay, positions), mode='lines',
+                                             name=f'{stock_name} {spec} {line_name}',
+                                             yaxis='y' if on_price_axis else 'y2'))
 
     layout_stocks = go.Layout(
-        title='Stock Close Price vs Time',
-        xaxis=dict(title='Time', autorange=True),
+        title='Stock Price vs Time' if chart == 'candlestick' else 'Stock Close Price vs Time',
+        xaxis=dict(title='Time', autorange=True, rangeslider=dict(visible=False)),
         yaxis=dict(title='USD $', autorange=True)
     )
+    if secondary_axis:
+        layout_stocks.yaxis2 = dict(title='Indicator', overlaying='y', side='right')
+
+    with stage('figure'):
+        return go.Figure(data=traces, layout=layout_stocks)
+
+
+def plot_stocks(stock_names: list[str], time_period: str, use_processes: Optional[bool] = False,
+                max_points: Optional[int] = None, decimation: str = 'lttb',
+                indicators: Sequence[str] = (), chart: str = 'line',
+                frequency: Optional[str] = None) -> None:
+    """Plot a scatterplot of any number of stocks over the same time_period, on the same set of
+    axes.
 
-    figure = go.Figure(data=[line_stock1], layout=layout_stocks)
+    The stocks are loaded concurrently (see load_stocks), each line is reduced to about max_points
+    points if max_points is given, the indicators are drawn over every stock, and chart and
+    frequency choose between lines and candlesticks of daily or longer bars (see build_figure).
+
+    NOTE: Ensure that there is a corresponding csv file for every stock in stock_names in the main
+    folder of the project.
+
+    Preconditions:
+        - time_period is 'max', a period like '15_days', '1_month' or '5_years', or an ISO date
+          range like '2020-01-01:2020-12-31' (see period_bounds)
+        - max_points is None or max_points >= 4
+        - chart in ('line', 'candlestick')
+        - frequency is None or frequency == 'auto' or frequency in FREQUENCIES
+    """
+    import plotly.offline as pyo
 
-    pyo.plot(figure)
+    with maybe_report('plot_stocks', stock_names=stock_names, time_period=time_period,
+                      max_points=max_points, chart=chart, frequency=frequency):
+        with stage('build_figure'):
+            figure = build_figure(stock_names, time_period, use_processes=use_processes,
+                                  max_points=max_points, decimation=decimation,
+                                  indicators=indicators, chart=chart, frequency=frequency)
+        with stage('plot'):
+            pyo.plot(figure)
+
+
+def plot_candlestick(stock_name: str, time_period: str, frequency: str = 'auto') -> None:
+    """Plot a candlestick chart of stock_name over time_period, with bars of frequency (see
+    build_figure).
+    """
+    plot_stocks([stock_name], time_period, chart='candlestick', frequency=frequency)
+
+
+def plot_scatter_plot_1stock(time_period: str, stock_name1: str) -> None:
+    """Plot a scatterplot for 1 stock, i.e. stock_name1 over a fixed time_period.
+
+    NOTE: Ensure that there is a corresponding csv file for stock_name1 in the main folder of the
+    project. In case there is no existent csv file in the folder, follow the instruction in the main
+    description of the project to download the csv file from "https://finance.yahoo.com/".
+
+    Preconditions:
+        - time_period is 'max', a period like '15_days', '1_month' or '5_years', or an ISO date
+          range like '2020-01-01:2020-12-31' (see period_bounds)
+    """
+    plot_stocks([stock_name1], time_period)
 
 
 def plot_scatter_plot_2stocks(time_period: str, stock_name1: str, stock_name2: str) -> None:
@@ -232,76 +1792,10 @@ def plot_scatter_plot_2stocks(time_period: str, stock_name1: str, stock_name2: s
     "https://finance.yahoo.com/".
 
     Preconditions:
-        - time_period == any('max', '5_years', '2_years', '1_year', '1_month', '15_days')
+        - time_period is 'max', a period like '15_days', '1_month' or '5_years', or an ISO date
+          range like '2020-01-01:2020-12-31' (see period_bounds)
     """
-    extracted_data1 = _extract_data(stock_name1)
-    extracted_data2 = _extract_data(stock_name2)
-
-    x_stock1, y_stock1 = ([], [])
-    x_stock2, y_stock2 = ([], [])
-
-    if time_period == 'max':
-        x_stock1, y_stock1 = extracted_data1
-        x_stock2, y_stock2 = extracted_data2
-    elif time_period == '5_years':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - (365*5):], \
-                             extracted_data1[1][len(extracted_data1) - (365 * 5):]
-        x_stock2, y_stock2 = extracted_data2[0][len(extracted_data2) - (365 * 5):], \
-                             extracted_data2[1][len(extracted_data2) - (365 * 5):]
-    elif time_period == '4_years':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - (365 * 4):], \
-                             extracted_data1[1][len(extracted_data1) - (365 * 4):]
-        x_stock2, y_stock2 = extracted_data2[0][len(extracted_data2) - (365 * 4):], \
-                             extracted_data2[1][len(extracted_data2) - (365 * 4):]
-    elif time_period == '3_years':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - (365 * 3):], \
-                             extracted_data1[1][len(extracted_data1) - (365 * 3):]
-        x_stock2, y_stock2 = extracted_data2[0][len(extracted_data2) - (365 * 3):], \
-                             extracted_data2[1][len(extracted_data2) - (365 * 3):]
-    elif time_period == '2_years':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - (365 * 2):], \
-                             extracted_data1[1][len(extracted_data1) - (365 * 2):]
-        x_stock2, y_stock2 = extracted_data2[0][len(extracted_data2) - (365 * 2):], \
-                             extracted_data2[1][len(extracted_data2) - (365 * 2):]
-    elif time_period == '1_year':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - 365:], \
-                             extracted_data1[1][len(extracted_data1) - 365:]
-        x_stock2, y_stock2 = extracted_data2[0][len(extracted_data2) - 365:], \
-                             extracted_data2[1][len(extracted_data2) - 365:]
-    elif time_period == '1_month':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - 30:], \
-                             extracted_data1[1][len(extracted_data1) - 30:]
-        x_stock2, y_stock2 = extracted_data2[0][len(extracted_data2) - 30:], \
-                             extracted_data2[1][len(extracted_data2) - 30:]
-    elif time_period == '15_days':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - 15:], \
-                             extracted_data1[1][len(extracted_data1) - 15:]
-        x_stock2, y_stock2 = extracted_data2[0][len(extracted_data2) - 15:], \
-                             extracted_data2[1][len(extracted_data2) - 15:]
-
-    line_stock1 = go.Scatter(
-        x=x_stock1,
-        y=y_stock1,
-        mode='lines',
-        name=stock_name1
-    )
-
-    line_stock2 = go.Scatter(
-        x=x_stock2,
-        y=y_stock2,
-        mode='lines',
-        name=stock_name2
-    )
-
-    layout_stocks = go.Layout(
-        title='Stock Close Price vs Time',
-        xaxis=dict(title='Time', autorange=True),
-        yaxis=dict(title='USD $', autorange=True)
-    )
-
-    figure = go.Figure(data=[line_stock1, line_stock2], layout=layout_stocks)
-
-    pyo.plot(figure)
+    plot_stocks([stock_name1, stock_name2], time_period)
 
 
 def plot_scatter_plot_3stocks(time_period: str, stock_name1: str, stock_name2: str,
@@ -316,116 +1810,16 @@ def plot_scatter_plot_3stocks(time_period: str, stock_name1: str, stock_name2: s
     "https://finance.yahoo.com/".
 
     Preconditions:
-        - time_period == any('max', '5_years', '2_years', '1_year', '1_month', '15_days')
+        - time_period is 'max', a period like '15_days', '1_month' or '5_years', or an ISO date
+          range like '2020-01-01:2020-12-31' (see period_bounds)
     """
-    extracted_data1 = _extract_data(stock_name1)
-    extracted_data2 = _extract_data(stock_name2)
-    extracted_data3 = _extract_data(stock_name3)
-
-    x_stock1, y_stock1 = ([], [])
-    x_stock2, y_stock2 = ([], [])
-    x_stock3, y_stock3 = ([], [])
-
-    if time_period == 'max':
-        x_stock1, y_stock1 = extracted_data1
-        x_stock2, y_stock2 = extracted_data2
-        x_stock3, y_stock3 = extracted_data3
-    elif time_period == '5_years':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - (365 * 5):], \
-                             extracted_data1[1][len(extracted_data1) - (365 * 5):]
-        x_stock2, y_stock2 = extracted_data2[0][len(extracted_data2) - (365 * 5):], \
-                             extracted_data2[1][len(extracted_data2) - (365 * 5):]
-        x_stock3, y_stock3 = extracted_data3[0][len(extracted_data3) - (365 * 5):], \
-                             extracted_data3[1][len(extracted_data3) - (365 * 5):]
-    elif time_period == '4_years':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - (365 * 4):], \
-                             extracted_data1[1][len(extracted_data1) - (365 * 4):]
-        x_stock2, y_stock2 = extracted_data2[0][len(extracted_data2) - (365 * 4):], \
-                             extracted_data2[1][len(extracted_data2) - (365 * 4):]
-        x_stock3, y_stock3 = extracted_data3[0][len(extracted_data3) - (365 * 4):], \
-                             extracted_data3[1][len(extracted_data3) - (365 * 4):]
-    elif time_period == '3_years':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - (365 * 3):], \
-                             extracted_data1[1][len(extracted_data1) - (365 * 3):]
-        x_stock2, y_stock2 = extracted_data2[0][len(extracted_data2) - (365 * 3):], \
-                             extracted_data2[1][len(extracted_data2) - (365 * 3):]
-        x_stock3, y_stock3 = extracted_data3[0][len(extracted_data3) - (365 * 3):], \
-                             extracted_data3[1][len(extracted_data3) - (365 * 3):]
-    elif time_period == '2_years':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - (365 * 2):], \
-                             extracted_data1[1][len(extracted_data1) - (365 * 2):]
-        x_stock2, y_stock2 = extracted_data2[0][len(extracted_data2) - (365 * 2):], \
-                             extracted_data2[1][len(extracted_data2) - (365 * 2):]
-        x_stock3, y_stock3 = extracted_data3[0][len(extracted_data3) - (365 * 2):], \
-                             extracted_data3[1][len(extracted_data3) - (365 * 2):]
-    elif time_period == '1_year':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - 365:], \
-                             extracted_data1[1][len(extracted_data1) - 365:]
-        x_stock2, y_stock2 = extracted_data2[0][len(extracted_data2) - 365:], \
-                             extracted_data2[1][len(extracted_data2) - 365:]
-        x_stock3, y_stock3 = extracted_data3[0][len(extracted_data3) - 365:], \
-                             extracted_data3[1][len(extracted_data3) - 365:]
-    elif time_period == '1_month':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - 30:], \
-                             extracted_data1[1][len(extracted_data1) - 30:]
-        x_stock2, y_stock2 = extracted_data2[0][len(extracted_data2) - 30:], \
-                             extracted_data2[1][len(extracted_data2) - 30:]
-        x_stock3, y_stock3 = extracted_data3[0][len(extracted_data3) - 30:], \
-                             extracted_data3[1][len(extracted_data3) - 30:]
-    elif time_period == '15_days':
-        x_stock1, y_stock1 = extracted_data1[0][len(extracted_data1) - 15:], \
-                             extracted_data1[1][len(extracted_data1) - 15:]
-        x_stock2, y_stock2 = extracted_data2[0][len(extracted_data2) - 15:], \
-                             extracted_data2[1][len(extracted_data2) - 15:]
-        x_stock3, y_stock3 = extracted_data3[0][len(extracted_data3) - 15:], \
-                             extracted_data3[1][len(extracted_data3) - 15:]
-
-    line_stock1 = go.Scatter(
-        x=x_stock1,
-        y=y_stock1,
-        mode='lines',
-        name=stock_name1
-    )
-
-    line_stock2 = go.Scatter(
-        x=x_stock2,
-        y=y_stock2,
-        mode='lines',
-        name=stock_name2
-    )
-
-    line_stock3 = go.Scatter(
-        x=x_stock3,
-        y=y_stock3,
-        mode='lines',
-        name=stock_name3
-    )
-
-    layout_stocks = go.Layout(
-        title='Stock Close Price vs Time',
-        xaxis=dict(title='Time', autorange=True),
-        yaxis=dict(title='USD $', autorange=True)
-    )
-
-    figure = go.Figure(data=[line_stock1, line_stock2, line_stock3], layout=layout_stocks)
-
-    pyo.plot(figure)
+    plot_stocks([stock_name1, stock_name2, stock_name3], time_period)
 
 
 def _extract_data(stock_name: str) -> tuple[list[datetime], list[float]]:
     """Return a tuple containing two lists, first containing all the dates in the data for the
     specific stock_name and the second list containing the corresponding stock close price values.
     """
-    file = stock_name + '.csv'
-    data = read_data(stock_name, file)
-    lst_of_day = []
-    lst_of_stock_price = []
-
-    stock_data = data[stock_name]
-    for i in range(len(stock_data.stock_price_close)):
-        day = stock_data.stock_price_close[i][0]
-        stock_close_price = stock_data.stock_price_close[i][1]
-        lst_of_day.append(day)
-        lst_of_stock_price.append(stock_close_price)
+    stock_data = load_stock(stock_name)
 
-    return (lst_of_day, lst_of_stock_price)
+    return (stock_data.dates(), stock_data.close.tolist())